@@ -1,40 +1,57 @@
+import asyncio
 import os
 
-from utils.general import write_log_check_email_body, send_email, archive_log
+from utils.general import write_log_check_email_body, send_emails, get_send_email_params, archive_log, count_file_lines
 
-def main():
+# ( log file path , script that writes to the log file )
+LOG_CHECKS = (
+    ('main_info.log', 'main.py'),
+    ('write_tabulator_rows_info.log', 'write_tabulator_rows.py'),
+    ('service_maintenance_info.log', 'service_maintenance.py'),
+)
 
-    sender, recipient, password = os.getenv('SEND_EMAIL_PARAMS').split(',')
+# log files with more lines than this get archived
+MAX_LOG_LINES = 10_000
 
-    # checking main_info.log
-    body = write_log_check_email_body(file_path='main_info.log', previous_hours=1, check_level='WARNING')
-    if body:
-        send_email('LOGGING NOTIFICATION: ak-wildfire-values-at-risk, main.py', body, sender, recipient, password)
+async def check_log(log_path: str, script_name: str) -> tuple[str, str] | None:
+    '''
+    Checks a log file for recent warnings, then archives the log file if it has grown too long.
+    Blocking file reads are run in worker threads so that all log checks can run concurrently.
 
-    with open('main_info.log', 'r') as file:
-        lines = sum(1 for _ in file)
-    if lines > 10_000:
-        archive_log('main_info.log', 'logs')
+    Returns:
+        tuple[str, str] | None: ( email subject , email body ) if there are recent warnings, else None.
+    '''
+    # a missing or empty log file has nothing to report or archive
+    try:
+        log_size = os.stat(log_path).st_size
+    except FileNotFoundError:
+        return None
+    if log_size == 0:
+        return None
 
-    # checking write_tabulator_rows_info.log
-    body = write_log_check_email_body(file_path='write_tabulator_rows_info.log', previous_hours=1, check_level='WARNING')
-    if body:
-        send_email('LOGGING NOTIFICATION: ak-wildfire-values-at-risk, write_tabulator_rows.py', body, sender, recipient, password)
+    body = await asyncio.to_thread(write_log_check_email_body, file_path=log_path, previous_hours=1, check_level='WARNING')
 
-    with open('write_tabulator_rows_info.log', 'r') as file:
-        lines = sum(1 for _ in file)
-    if lines > 10_000:
-        archive_log('write_tabulator_rows_info.log', 'logs')
+    # every line takes at least one byte, so a file can only exceed the line limit if it also exceeds that many bytes
+    if log_size > MAX_LOG_LINES and await asyncio.to_thread(count_file_lines, log_path) > MAX_LOG_LINES:
+        archive_log(log_path, 'logs')
 
-    # checking service_maintenance_info.log
-    body = write_log_check_email_body(file_path='service_maintenance_info.log', previous_hours=1, check_level='WARNING')
     if body:
-        send_email('LOGGING NOTIFICATION: ak-wildfire-values-at-risk, service_maintenance.py', body, sender, recipient, password)
+        return (f'LOGGING NOTIFICATION: ak-wildfire-values-at-risk, {script_name}', body)
+    return None
+
+async def check_all_logs() -> list[tuple[str, str] | None]:
+    return await asyncio.gather(
+        *(check_log(log_path, script_name) for log_path, script_name in LOG_CHECKS)
+    )
+
+def main():
+
+    sender, recipient, password = get_send_email_params()
+
+    notifications = asyncio.run(check_all_logs())
 
-    with open('service_maintenance_info.log', 'r') as file:
-        lines = sum(1 for _ in file)
-    if lines > 10_000:
-        archive_log('service_maintenance_info.log', 'logs')
+    # all notifications are sent through a single SMTP session
+    send_emails([msg for msg in notifications if msg], sender, recipient, password)
 
     return
 
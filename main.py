@@ -1,23 +1,20 @@
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import geopandas as gpd
-import json
-import multiprocessing
-import os
 import pathlib
-import pandas as pd
-import pickle as pkl
-import shapely as shp
 import sys
 import time
 import traceback
 
-from utils.general import basic_file_logger, format_logged_exception, send_email
-from utils.project import acdc_update_email
+from utils.general import basic_file_logger, format_logged_exception, send_email, get_send_email_params, LazyJSON
+from utils.project import acdc_update_email, load_plan
 from utils.arcgis_helpers import checkout_token, fresh_pickles
-from process.prepare_wfigs_inputs import get_wfigs_updates, prevent_perimeter_overwrite_by_point, create_wfigs_fire_points_gdf, create_wfigs_fire_polys_gdf, create_analysis_gdf
-from process.queries import gather_query_bundles, send_all_queries, handle_query_response_pools
-from process.analysis import gather_analysis_pairs, gather_processes, gather_results, create_attribute_dataframe, join_fires_bufs_attributes, parse_analysis_errors
-from process.output import format_fields, create_output_feature_lists, apply_edits_to_dof_var_service, find_apply_edits_failure, find_apply_edits_success
+from process.prepare_wfigs_inputs import get_wfigs_updates, prevent_perimeter_overwrite_by_point, cache_wfigs_features, create_wfigs_fire_points_gdf, create_wfigs_fire_polys_gdf, create_analysis_gdf
+
+# resolved once at import, all paths are relative to the directory the process is started from
+PROJ_DIR = pathlib.Path.cwd()
+PLANS_DIR = PROJ_DIR / 'planning'
+WFIGS_CACHE = PROJ_DIR / 'wfigs_json_pickles'
 
 def main():
 
@@ -27,17 +24,25 @@ def main():
 
         #REGION SETUP
 
-        sender, recipient, password = os.getenv('SEND_EMAIL_PARAMS').split(',')
+        sender, recipient, password = get_send_email_params()
 
         logger = basic_file_logger('main_info.log')
         logger.info('STARTING PROCESS')
 
-        proj_dir = pathlib.Path.cwd()
-        plans_dir = proj_dir / 'planning'
+        # token checkouts are network-bound and plan reads are disk-bound, none depend on each other so they run concurrently
+        # these plans dictate which inputs are queried, how inputs are queried, how results are analyzed, and how outputs are represented
+        # modifying plans is an easy way to adjust any of the above
+        # viewing plans can provide a high level overview of what the main process is currently doing
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            nifc_token_future = executor.submit(checkout_token, 'NIFC_AGO', 120, 'NIFC_TOKEN', 15)
+            dnr_token_future = executor.submit(checkout_token, 'DNR_AGO', 120, 'DNR_TOKEN', 15)
+            query_plan_future = executor.submit(load_plan, PLANS_DIR / 'query_plan.tsv')
+            analysis_plan_future = executor.submit(load_plan, PLANS_DIR / 'analysis_plan.tsv')
+            schema_plan_future = executor.submit(load_plan, PLANS_DIR / 'schema_plan.tsv')
 
         # accessing the nifc portal is considered critical (cannot query or applyEdits to target service without a token)
         try:
-            nifc_token = checkout_token('NIFC_AGO', 120, 'NIFC_TOKEN', 15)
+            nifc_token = nifc_token_future.result()
         except Exception as e:
             logger.critical('Unable to access NIFC portal... exiting with code 1.')
             exc_type, exc_val, exc_tb = type(e), e, e.__traceback__
@@ -46,7 +51,7 @@ def main():
 
         # accessing the dnr portal is not considered critical (but queries against private dnr services will fail without a token)
         try:
-            dnr_token = checkout_token('DNR_AGO', 120, 'DNR_TOKEN', 15)
+            dnr_token = dnr_token_future.result()
         except Exception as e:
             logger.error('Unable to access DNR portal.')
             exc_type, exc_val, exc_tb = type(e), e, e.__traceback__
@@ -55,12 +60,9 @@ def main():
 
         token_dict = {'nifc': nifc_token, 'dnr': dnr_token}
 
-        # these plans dictate which inputs are queried, how inputs are queried, how results are analyzed, and how outputs are represented
-        # modifying plans is an easy way to adjust any of the above
-        # viewing plans can provide a high level overview of what the main process is currently doing
-        query_plan = pd.read_csv(plans_dir / 'query_plan.tsv', delimiter='\t')
-        analysis_plan = pd.read_csv(plans_dir / 'analysis_plan.tsv', delimiter='\t')
-        schema_plan = pd.read_csv(plans_dir / 'schema_plan.tsv', delimiter='\t')
+        query_plan = query_plan_future.result()
+        analysis_plan = analysis_plan_future.result()
+        schema_plan = schema_plan_future.result()
 
         #ENDREGION
 
@@ -91,7 +93,7 @@ def main():
                 sys.exit(1)
             else:
                 logger.info(
-                    json.dumps(
+                    LazyJSON(
                         {
                             'WFIGS points retrieved': len(wfigs_points['features']),
                             'WFIGS polygons retrieved': len(wfigs_polys['features'])
@@ -99,14 +101,13 @@ def main():
                     )
                 )
         except KeyError as e:
-            logger.info(json.dumps(wfigs_points))
-            logger.info(json.dumps(wfigs_polys))
+            logger.info(LazyJSON(wfigs_points))
+            logger.info(LazyJSON(wfigs_polys))
             exc_type, exc_val, exc_tb = type(e), e, e.__traceback__
             logger.critical(format_logged_exception(exc_type, exc_val, exc_tb))
             sys.exit(1)
 
-        wfigs_cache = proj_dir / 'wfigs_json_pickles'
-        wfigs_points['features'] = prevent_perimeter_overwrite_by_point(wfigs_cache, wfigs_points['features'])
+        wfigs_points['features'] = prevent_perimeter_overwrite_by_point(WFIGS_CACHE, wfigs_points['features'])
 
         # filtering out features that have already been analyzed
         # fires recently called 'Out' can repeatedly be returned by timestamp query, because they are removed from the target service and archived
@@ -118,10 +119,10 @@ def main():
             # so update does not succeed, yet subsequent executions will ignore the new fire because we think its already been processed
             # solution is to retain a list of features that will be processed by an execution cycle, and after applyEdits success save to cache
         if check_json_pickles:
-            wfigs_points['features'] = fresh_pickles(wfigs_cache, wfigs_points['features'], 'IrwinID', exempt_identifiers=irwins_with_errors)
-            wfigs_polys['features'] = fresh_pickles(wfigs_cache, wfigs_polys['features'], 'attr_IrwinID', exempt_identifiers=irwins_with_errors)
+            wfigs_points['features'] = fresh_pickles(WFIGS_CACHE, wfigs_points['features'], 'IrwinID', exempt_identifiers=irwins_with_errors)
+            wfigs_polys['features'] = fresh_pickles(WFIGS_CACHE, wfigs_polys['features'], 'attr_IrwinID', exempt_identifiers=irwins_with_errors)
             logger.info(
-                json.dumps(
+                LazyJSON(
                     {
                         'New WFIGS points to process': len(wfigs_points['features']),
                         'New WFIGS polygons to process': len(wfigs_polys['features'])
@@ -144,6 +145,14 @@ def main():
             logger.info('No WFIGS updates to process... exiting with code 0.')
             sys.exit(0)
 
+        # most cycles exit above with no updates to process
+        # modules only needed for queries, analysis, and output are imported from here on, so no-op cycles never pay for importing them
+        import numpy as np
+        import shapely as shp
+        from process.queries import gather_query_bundles, send_and_handle_all_queries
+        from process.analysis import gather_analysis_pairs, gather_tasks, gather_results, create_attribute_dataframe, join_fires_bufs_attributes, parse_analysis_errors
+        from process.output import format_fields, create_output_feature_lists, apply_edits_to_dof_var_service, find_apply_edits_failure, find_apply_edits_success
+
         analysis_gdf = create_analysis_gdf(wfigs_points_gdf, wfigs_polys_gdf)
 
         # 20250825 edge case
@@ -173,49 +182,32 @@ def main():
             token_dict=token_dict
             )
         
+        # batch size determined dynamically based on ratio of query bundles to analysis zones
+        batch_size = len(query_bundles) // len(analysis_gdf)
+
         t0 = time.time()
 
-        query_responses, exception = asyncio.run(send_all_queries(query_bundles))
+        # query responses are handled in worker processes as they arrive
+        query_results, query_response_count, exception = asyncio.run(send_and_handle_all_queries(query_bundles, analysis_plan, batch_size))
 
         # this condition should not even be possible
-        # first exceptions will be present in query_responses as (result_identifier, url_alias, (exc_type, exc_val, exc_tb))
-        # then with asyncio.gather(..., return_exceptions=True), query_responses would contain an Exception object if the expected tuple could not be returned
-        # finally, the exception attribute of the requester class instance in get_var_features() would be populated with (exc_type, exc_val, exc_tb)
+        # first exceptions will be present in query responses as (result_identifier, url_alias, (exc_type, exc_val, exc_tb))
+        # then any Exception object raised in place of the expected tuple is reduced and handled like any other response
+        # finally, the exception attribute of the requester class instance would be populated with (exc_type, exc_val, exc_tb)
         if exception:
             logger.critical('Exception propogated during asynchronous queries... exiting with code 1.')
             logger.critical(format_logged_exception(*exception))
             sys.exit(1)
 
-        # also should not be possible for Exception object to be present in query_responses
-        # we check just in case, and reduce any Exception object to enable pickling during multiprocessing
-        query_response_reduced_exceptions = [resp.__reduce__() for resp in query_responses if isinstance(resp, Exception)]
-        query_responses = [resp for resp in query_responses if not isinstance(resp, Exception)]
-        query_responses.extend(query_response_reduced_exceptions)
-
-        t1 = time.time()
-
-        logger.info(
-            json.dumps(
-                {
-                    'queries completed': len(query_responses),
-                    'seconds': round(t1-t0, 2)
-                }
-            )
-        )
-
-        # batch size determined dynamically based on ratio of query responses to analysis zones
-        batch_size = len(query_responses) // len(analysis_gdf)
-
-        t0 = time.time()
-
-        query_features_dict, results_no_analysis, logger_dict = handle_query_response_pools(query_responses, analysis_plan, batch_size)
+        query_features_dict, results_no_analysis, logger_dict = query_results
 
         t1 = time.time()
 
         logger.info(
-            json.dumps(
+            LazyJSON(
                 {
-                    'function': 'handle_query_response_pools()',
+                    'function': 'send_and_handle_all_queries()',
+                    'queries completed': query_response_count,
                     'seconds': round(t1-t0, 2)
                 }
             )
@@ -238,26 +230,24 @@ def main():
 
         #REGION ANALYSIS
 
-        analysis_gdf['geometry'].apply(shp.prepare)
+        shp.prepare(analysis_gdf['geometry'].to_numpy())
 
         analysis_pairs = gather_analysis_pairs(analysis_gdf, query_features_dict)
 
-        manager_queue = multiprocessing.Manager().Queue()
-
-        all_processes = gather_processes(analysis_pairs, analysis_plan, manager_queue)
+        all_tasks = gather_tasks(analysis_pairs, analysis_plan)
 
         t0 = time.time()
 
-        results = gather_results(all_processes, manager_queue)
+        results = gather_results(all_tasks)
 
         t1 = time.time()
 
-        analysis_gdf['geometry'].apply(shp.destroy_prepared)
+        shp.destroy_prepared(analysis_gdf['geometry'].to_numpy())
 
         logger.info(
-            json.dumps(
+            LazyJSON(
                 {
-                    'processes executed': len(all_processes),
+                    'tasks executed': len(all_tasks),
                     'seconds': round(t1-t0, 2)
                 }
             )
@@ -280,19 +270,28 @@ def main():
         # this could mean the value has already been truncated, or future truncation is probable
         # use-case is for json serialized field types with somewhat unpredictable content
         # helper functions in process.analysis 'pop' lower priority objects to shorten json structures that would cause applyEdits to fail if serialized in full
-        str_cols = fires_bufs_attrs_gdf.select_dtypes(include=['string']).columns
+        # it is fully expected _Nearest and _Interior fields will frequently be truncated, no reason to log warnings
+        # the fields themselves contain information on how many features were popped and at what distance from (or within) the fire this popping began
+        str_cols = [
+            col for col in fires_bufs_attrs_gdf.select_dtypes(include=['string']).columns
+            if '_Nearest' not in col and '_Interior' not in col
+        ]
+        incident_names = fires_bufs_attrs_gdf['wfigs_IncidentName'].to_numpy()
+        buffer_miles = fires_bufs_attrs_gdf['AnalysisBufferMiles'].to_numpy(dtype=np.int16)
         for col in str_cols:
-            # it is fully expected _Nearest and _Interior fields will frequently be truncated, no reason to log warnings
-            # the fields themselves contain information on how many features were popped and at what distance from (or within) the fire this popping began
-            if '_Nearest' in col or '_Interior' in col:
-                continue
-            trimmed = fires_bufs_attrs_gdf[fires_bufs_attrs_gdf[col].str.len() > 4900][['wfigs_IncidentName', 'AnalysisBufferMiles', col]]
-            for row in trimmed.itertuples(index=False):
-                logger.warning(f'Value approaching max field length limit, data could be truncated. Incident: {row.wfigs_IncidentName}, Buffer Miles: {row.AnalysisBufferMiles}, Field: {col}.')
+            # missing values are pd.NA, which have no length
+            lengths = np.fromiter(
+                (len(val) if isinstance(val, str) else 0 for val in fires_bufs_attrs_gdf[col].to_numpy()),
+                dtype=np.int64,
+                count=len(fires_bufs_attrs_gdf)
+            )
+            long_values = lengths > 4900
+            for incident_name, buf_miles in zip(incident_names[long_values], buffer_miles[long_values]):
+                logger.warning(f'Value approaching max field length limit, data could be truncated. Incident: {incident_name}, Buffer Miles: {buf_miles}, Field: {col}.')
 
         feat_dict = create_output_feature_lists(fires_bufs_attrs_gdf)
 
-        irwins_with_updates = fires_bufs_attrs_gdf[fires_bufs_attrs_gdf['AnalysisBufferMiles'] == 0]['wfigs_IrwinID'].to_list()
+        irwins_with_updates = fires_bufs_attrs_gdf['wfigs_IrwinID'].to_numpy()[buffer_miles == 0].tolist()
 
         all_edits_response, exception = asyncio.run(apply_edits_to_dof_var_service(
             akdof_var_service_url=r'https://services3.arcgis.com/T4QMspbfLg3qTGWY/arcgis/rest/services/AK_Wildfire_Values_at_Risk/FeatureServer',
@@ -310,23 +309,17 @@ def main():
         if failures:
             logger.critical('applyEdits failure detected!')
             for fail in failures:
-                logger.critical(json.dumps(fail))
+                logger.critical(LazyJSON(fail))
 
         successes = find_apply_edits_success(all_edits_response)
 
         if successes:
             logger.info('applyEdits success detected.')
             for success in successes:
-                logger.info(json.dumps(success))
+                logger.info(LazyJSON(success))
 
         if successes and not failures:
-            for feat in features_to_cache_on_success:
-                try:
-                    irwin = feat['attributes']['IrwinID']
-                except KeyError:
-                    irwin = feat['attributes']['attr_IrwinID']
-                with open(proj_dir / 'wfigs_json_pickles' / f'{irwin}.pkl', 'wb') as file:
-                    pkl.dump(feat, file)
+            cache_wfigs_features(WFIGS_CACHE, features_to_cache_on_success)
 
         logger.info('PROCESS FINISHED')
     
@@ -1,17 +1,21 @@
 # many functions in this module still need type hints and doc strings
 
-from copy import deepcopy
+import bisect
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import geopandas as gpd
 import itertools
-import json
-import math
 import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
 import pandas as pd
 import pathlib
-from pyproj import CRS, Transformer
-import queue
+import pickle as pkl
+from pyproj import Transformer
 import shapely as shp
 import sys
+from typing import Callable
+import ujson
 
 proj_root = pathlib.Path(__file__).parent.parent
 sys.path.append(proj_root)
@@ -19,6 +23,65 @@ sys.path.append(proj_root)
 from utils.project import batch_write_attr_tups, write_analysis_types_dict
 from utils.general import basic_file_logger, format_logged_exception
 
+# building a transformer is expensive, so one is built per process and reused for every transformation
+# always_xy keeps (x, y) ordering for both input (easting, northing) and output (lng, lat)
+_TRANSFORMER_3338_TO_4326 = Transformer.from_crs('EPSG:3338', 'EPSG:4326', always_xy=True)
+
+# pool workers are forked where possible, so they start as a copy of the parent without re-importing geopandas, shapely and pyproj
+# (fork is pinned explicitly, since newer python versions and some platforms no longer default to it)
+# Windows has no fork, so workers are spawned there
+# forking is safe here because workers only run GEOS/PROJ calls on their own inputs and never log or touch the parent's threads
+_MP_CONTEXT = multiprocessing.get_context('spawn' if sys.platform == 'win32' else 'fork')
+
+# below this many features, attribute values are counted with a Counter rather than grouped by pandas
+_COUNTER_MAX_FEATS = 2000
+
+def _json_dumps(obj) -> str:
+    '''
+    Serializes attribution JSON with ujson, using the same separators as json.dumps() so serialized lengths are unchanged.
+    '''
+    return ujson.dumps(obj, escape_forward_slashes=False, separators=(', ', ': '))
+
+class _SharedGDF:
+    '''
+    Holds a pickled GDF in a shared memory block.
+    Only the name and size of the block are pickled when the handle is sent to a worker process,
+    so a GDF used by several analysis tasks is serialized once rather than once per task.
+    '''
+
+    def __init__(self, gdf: gpd.GeoDataFrame):
+        payload = pkl.dumps(gdf, protocol=pkl.HIGHEST_PROTOCOL)
+        self._shm = shared_memory.SharedMemory(create=True, size=len(payload))
+        try:
+            self._shm.buf[:len(payload)] = payload
+        except BaseException:
+            self.release()
+            raise
+        self.name = self._shm.name
+        self.size = len(payload)
+
+    def __getstate__(self):
+        return {'name': self.name, 'size': self.size}
+
+    def __setstate__(self, state):
+        self.name = state['name']
+        self.size = state['size']
+        self._shm = None
+
+    def load(self) -> gpd.GeoDataFrame:
+        shm = shared_memory.SharedMemory(name=self.name)
+        try:
+            return pkl.loads(shm.buf[:self.size])
+        finally:
+            shm.close()
+
+    def release(self):
+        # only the creating process holds the block, releasing it more than once is a no-op
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
 def gather_analysis_pairs(analysis_gdf: gpd.GeoDataFrame, query_features_dict: dict) -> list[tuple]:
     '''
     Pairs together GDF of all features for a specific fire with GDF of an analysis input for that fire.
@@ -41,34 +104,32 @@ def gather_analysis_pairs(analysis_gdf: gpd.GeoDataFrame, query_features_dict: d
 
     return analysis_gdf_var_gdf_pairs
 
-def gather_processes(analysis_gdf_var_gdf_pairs: list[tuple], analysis_plan: pd.DataFrame, manager_queue: multiprocessing.Queue) -> list[multiprocessing.Process]:
+def gather_tasks(analysis_gdf_var_gdf_pairs: list[tuple], analysis_plan: pd.DataFrame) -> list[tuple[Callable, tuple]]:
     '''
-    Prepare all analysis processes to be run concurrently.
+    Prepare all analysis tasks to be run concurrently.
 
     Args:
         * analysis_gdf_var_gdf_pairs (list[tuple]) -- holds tuples for all unique combinations of IrwinID and analysis input.
             * tuple structure: ( GDF of all features for a specific fire , GDF of an analysis input  , alias for the analysis input )
         * analysis_plan (pd.DataFrame) -- determines which types of analyses to run (and which attributes to analyze) for all input data sources. 
-        * manager_queue (multiprocessing.Queue) -- holds all attribution tuples generated during multiprocessing analysis.
 
     Returns:
-        list[multiprocessing.Process]
+        list[tuple[Callable, tuple]] -- ( analysis function , arguments for the analysis function ) for every analysis task.
     '''
 
-    sub_processes = [_process_gdf_pair(tup, analysis_plan, manager_queue) for tup in analysis_gdf_var_gdf_pairs]
+    sub_tasks = [_process_gdf_pair(tup, analysis_plan) for tup in analysis_gdf_var_gdf_pairs]
 
-    all_processes = list(itertools.chain(*sub_processes))
+    all_tasks = list(itertools.chain(*sub_tasks))
 
-    return all_processes
+    return all_tasks
 
-def gather_results(processes: list[multiprocessing.Process], manager_queue: multiprocessing.Queue, batch_size: int = multiprocessing.cpu_count()) -> list[list[tuple]]:
+def gather_results(tasks: list[tuple[Callable, tuple]], max_workers: int = multiprocessing.cpu_count()) -> list[list[tuple]]:
     '''
-    Execute all processes in batches that are sized according to system cpu count.
+    Execute all analysis tasks using a single pool of worker processes that is sized according to system cpu count.
 
     Args:
-        processes (list[multiprocessing.Process]) -- all analysis processes to be executed.
-        manager_queue (multiprocessing.Queue) -- holds all attribution tuples generated during multiprocessing analysis.
-        batch_size (int, optional) -- maximum number of processes to execute in each batch. Defaults to multiprocessing.cpu_count().
+        tasks (list[tuple[Callable, tuple]]) -- ( analysis function , arguments for the analysis function ) for every analysis task.
+        max_workers (int, optional) -- maximum number of worker processes. Defaults to multiprocessing.cpu_count().
 
     Returns:
         list[list[tuple]]: Deepest elements are attribution tuples formatted (IrwinID, buf_dist, attrName, attrVal).
@@ -76,31 +137,30 @@ def gather_results(processes: list[multiprocessing.Process], manager_queue: mult
 
     process_results = []
 
-    # batch_size (system cpu count by default) determines number of running processes that live between p.start() and p.join()
-    for i in range(0, len(processes), batch_size):
-
-        batch = processes[i:i+batch_size]
-
-        for p in batch:
-            p.start()
-
-        # to avoid deadlock scenario, must ensure all items put on manager_queue will be removed before the process is joined
-        while True:
-            try:
-                result = manager_queue.get(block=False)
-                process_results.append(result)
-            except queue.Empty:
-                pass
-            all_exited = True
-            for p in batch:
-                if p.exitcode is None:
-                    all_exited = False
-                    break
-            if all_exited and manager_queue.empty():
-                break
-
-        for p in batch:
-            p.join()
+    # each GDF is serialized into shared memory once for all tasks that analyze it.
+    # blocks are only created here, so they are all freed below once every worker is done reading them
+    shared_gdfs = {}
+    try:
+        shared_tasks = []
+        for func, args in tasks:
+            shared_args = []
+            for arg in args:
+                if isinstance(arg, gpd.GeoDataFrame):
+                    if id(arg) not in shared_gdfs:
+                        shared_gdfs[id(arg)] = _SharedGDF(arg)
+                    arg = shared_gdfs[id(arg)]
+                shared_args.append(arg)
+            shared_tasks.append((func, tuple(shared_args)))
+
+        # worker processes are started once and reused for every task, each task returns its list of attribution tuples
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=_MP_CONTEXT) as executor:
+            futures = [executor.submit(func, *args) for func, args in shared_tasks]
+            for future in as_completed(futures):
+                process_results.append(future.result())
+
+    finally:
+        for shared_gdf in shared_gdfs.values():
+            shared_gdf.release()
 
     return process_results
 
@@ -140,16 +200,18 @@ def create_attribute_dataframe(results: list[list[tuple]]) -> pd.DataFrame:
         - pd.DataFrame -- DataFrame with buf_dist & IrwinID multi-index, and columns for each unique attrName.
     """
     # flatten the attribute lists into a dataframe
-    attributes_dataframe = pd.DataFrame(itertools.chain(*results), columns=['IrwinID', 'buf_dist', 'attrName', 'attrVal'])
+    # (a materialized list of tuples lets pandas convert all records at once instead of consuming an iterator)
+    attribute_tups = list(itertools.chain.from_iterable(results))
+    attributes_dataframe = pd.DataFrame.from_records(attribute_tups, columns=['IrwinID', 'buf_dist', 'attrName', 'attrVal'])
 
     # assign buf_dist + IrwinID index (will be used for join)
     # create attrName column
-    # pivot attrVal so values are written to the appropriate attrName column
-    attributes_dataframe_pivot = pd.pivot(
-        data=attributes_dataframe,
-        columns='attrName',
-        index=['buf_dist', 'IrwinID'],
-        values='attrVal'
+    # unstack attrVal so values are written to the appropriate attrName column
+    # (there is one attrVal per buf_dist + IrwinID + attrName, so no aggregation is needed)
+    attributes_dataframe_pivot = (
+        attributes_dataframe
+        .set_index(['buf_dist', 'IrwinID', 'attrName'])['attrVal']
+        .unstack('attrName')
         )
     
     return attributes_dataframe_pivot
@@ -169,85 +231,63 @@ def join_fires_bufs_attributes(analysis_gdf: gpd.GeoDataFrame, attributes_df: pd
     analysis_gdf.reset_index(drop=True, inplace=True)
     return analysis_gdf
 
-def _process_gdf_pair(analysis_pair: tuple, analysis_plan: pd.DataFrame, manager_queue: multiprocessing.Queue) -> list[multiprocessing.Process]:
+def _process_gdf_pair(analysis_pair: tuple, analysis_plan: pd.DataFrame) -> list[tuple[Callable, tuple]]:
     '''
-    Creates all processes for a given fire (including its buffer zones) and value-at-risk input.
+    Creates all analysis tasks for a given fire (including its buffer zones) and value-at-risk input.
 
     Arguments:
         analysis_pair -- tuple structure: ( GDF of all features for a specific fire , GDF of an analysis input  , alias for the analysis input )
         analysis_plan -- determines which types of analyses to run (and which attributes to analyze) for all input data sources.
-        manager_queue -- holds all attribution tuples generated during multiprocessing analysis.
 
     Raises:
         ValueError: Unable to determine geometry type of value-at-risk input.
 
     Returns:
-        list -- processes to be run for the analysis of a given fire (including its buffer zones) and value-at-risk input
+        list -- ( analysis function , arguments ) tasks to be run for the analysis of a given fire (including its buffer zones) and value-at-risk input
     '''    
 
     fire_buf_gdf, var_gdf, var_alias = analysis_pair
 
     #* using heuristic that any gdf constructed from querying a single arcgis rest api endpoint can only have one general geometry type
     var_geom_type = var_gdf.loc[0,'geometry'].geom_type.casefold()
-    poly_var = 'polygon' in var_geom_type
-    line_var = 'line' in var_geom_type
-    point_var = 'point' in var_geom_type
+    if 'polygon' in var_geom_type:
+        preprocess_var, analyze_var = _preprocess_poly_var_gdf, _analyze_poly_var
+    elif 'line' in var_geom_type:
+        preprocess_var, analyze_var = _preprocess_line_var_gdf, _analyze_line_var
+    elif 'point' in var_geom_type:
+        preprocess_var, analyze_var = _preprocess_point_var_gdf, _analyze_point_var
+    else:
+        raise ValueError(f'Unrecognized geometry type in {var_gdf['geometry'].geom_type.unique()}')
 
     analysis_types = write_analysis_types_dict(analysis_plan, var_alias)
     
-    processes = []
+    tasks = []
+
+    # one row per buffer ring, looked up by buf_dist
+    fire_bufs_by_dist = {int(row.buf_dist): row for row in fire_buf_gdf.itertuples(index=False)}
+
+    # only the geometry and fields read by the analyses are shared with worker processes
+    used_fields = {field for key, fields in analysis_types.items() if key.endswith('_FIELDS') for field in fields}
+    var_gdf = var_gdf[[col for col in var_gdf.columns if col == 'geometry' or col in used_fields]]
 
+    # every task for this pair holds the same var_gdf, so gather_results() only moves it into shared memory once
     if 'NEAREST_FEATS_FIELDS' in analysis_types:
-        process_args = [
-            deepcopy(obj) for obj in (
-                fire_buf_gdf[fire_buf_gdf['buf_dist'] == 0].iloc[0]['IrwinID'],
-                fire_buf_gdf[fire_buf_gdf['buf_dist'] == 0].iloc[0]['geometry'],
-                # for consistency sake, only run _nearest_feats_analysis() on the 5 mile buffer geometry (not full bbox query result)
-                gpd.clip(var_gdf, fire_buf_gdf[fire_buf_gdf['buf_dist'] == 5].iloc[0]['geometry']),
-                var_alias,
-                analysis_types['NEAREST_FEATS_FIELDS']
-            )
-        ]
-        process_args.append(manager_queue)
-        p = multiprocessing.Process(
-            target=_nearest_feats_analysis,
-            args=process_args
+        process_args = (
+            fire_bufs_by_dist[0].IrwinID,
+            fire_bufs_by_dist[0].geometry,
+            var_gdf,
+            fire_bufs_by_dist[5].geometry,
+            var_alias,
+            analysis_types['NEAREST_FEATS_FIELDS']
         )
-        processes.append(p)
-
-    if poly_var:
-        for _, row in fire_buf_gdf.iterrows():
-            process_args = [deepcopy(obj) for obj in (row['IrwinID'], row['geometry'], row['buf_dist'], var_gdf, var_alias, analysis_types)]
-            process_args.append(manager_queue)
-            p = multiprocessing.Process(
-                target=_analyze_poly_var,
-                args=process_args
-            )
-            processes.append(p)
-
-    elif line_var:
-        for _, row in fire_buf_gdf.iterrows():
-            process_args = [deepcopy(obj) for obj in (row['IrwinID'], row['geometry'], row['buf_dist'], var_gdf, var_alias, analysis_types)]
-            process_args.append(manager_queue)
-            p = multiprocessing.Process(
-                target=_analyze_line_var,
-                args=process_args
-            )
-            processes.append(p)
-
-    elif point_var:
-        for _, row in fire_buf_gdf.iterrows():
-            process_args = [deepcopy(obj) for obj in (row['IrwinID'], row['geometry'], row['buf_dist'], var_gdf, var_alias, analysis_types)]
-            process_args.append(manager_queue)
-            p = multiprocessing.Process(
-                target=_analyze_point_var,
-                args=process_args
-            )
-            processes.append(p)
-    else:
-        raise ValueError(f'Unrecognized geometry type in {var_gdf['geometry'].geom_type.unique()}')
+        tasks.append((_nearest_feats_analysis, process_args))
 
-    return processes
+    # all buffer rings are analyzed within a single task
+    geoms_by_buf = {buf_dist: row.geometry for buf_dist, row in fire_bufs_by_dist.items()}
+    process_args = (fire_bufs_by_dist[0].IrwinID, geoms_by_buf, var_gdf, var_alias, analysis_types, preprocess_var, analyze_var)
+    tasks.append((_analyze_var_all_bufs, process_args))
+
+    return tasks
 
 def _preprocess_poly_var_gdf(var_gdf: gpd.GeoDataFrame, fire_geometry: shp.Polygon | shp.MultiPolygon) -> gpd.GeoDataFrame:
     '''
@@ -256,17 +296,34 @@ def _preprocess_poly_var_gdf(var_gdf: gpd.GeoDataFrame, fire_geometry: shp.Polyg
     Replaces feature geometries with the portion of their geometry intersecting the fire analysis zone.
     Calculates acreage of each features intersection area with the fire.
     '''
-    var_gdf['intersect_geom'] = var_gdf['geometry'].clip(fire_geometry)
+    # spatial index prefilter, so only features whose geometry actually intersects the fire get a full intersection
+    candidate_idx = np.sort(var_gdf.sindex.query(fire_geometry, predicate='intersects'))
+    geoms = var_gdf['geometry'].to_numpy()[candidate_idx]
+    intersect_geoms = shp.intersection(geoms, fire_geometry)
+
+    # a GDF that was already preprocessed for a larger analysis zone keeps the area of each features full geometry,
+    # so it can be preprocessed again for a smaller analysis zone lying within the larger one
+    if 'full_geometry_area' in var_gdf.columns:
+        full_areas = var_gdf['full_geometry_area'].to_numpy()[candidate_idx]
+    else:
+        full_areas = shp.area(geoms)
+
+    # drop features with no intersection geometry
+    # (iloc returns a new GDF, so the added columns never land on the caller's GDF)
+    has_intersect = ~(shp.is_empty(intersect_geoms) | shp.is_missing(intersect_geoms))
+    var_gdf = var_gdf.iloc[candidate_idx[has_intersect]].copy()
+    full_areas = full_areas[has_intersect]
+    intersect_geoms = intersect_geoms[has_intersect]
 
-    var_gdf = var_gdf[var_gdf['intersect_geom'].notna()].copy()
+    intersect_areas = shp.area(intersect_geoms)
 
-    var_gdf['fire_intersect_ratio'] = (var_gdf['intersect_geom'].area / var_gdf['geometry'].area)
+    var_gdf['full_geometry_area'] = full_areas
 
-    var_gdf['geometry'] = var_gdf['intersect_geom']
+    var_gdf['fire_intersect_ratio'] = intersect_areas / full_areas
 
-    var_gdf['geometry_acres'] = var_gdf['geometry'].area / 4046.86
+    var_gdf['geometry'] = gpd.GeoSeries(intersect_geoms, index=var_gdf.index, crs=var_gdf.crs)
 
-    var_gdf = var_gdf.drop(columns=['intersect_geom'])
+    var_gdf['geometry_acres'] = intersect_areas / 4046.86
 
     return var_gdf
 
@@ -277,48 +334,104 @@ def _preprocess_line_var_gdf(var_gdf: gpd.GeoDataFrame, fire_geometry: shp.Polyg
     Replaces feature geometries with the portion of their geometry intersecting the fire analysis zone.
     Calculates length in feet of each features intersection with the fire.
     '''
-    var_gdf['intersect_geom'] = var_gdf['geometry'].clip(fire_geometry)
+    # spatial index prefilter, so only features whose geometry actually intersects the fire get a full intersection
+    candidate_idx = np.sort(var_gdf.sindex.query(fire_geometry, predicate='intersects'))
+    geoms = var_gdf['geometry'].to_numpy()[candidate_idx]
+    intersect_geoms = shp.intersection(geoms, fire_geometry)
+
+    # a GDF that was already preprocessed for a larger analysis zone keeps the length of each features full geometry,
+    # so it can be preprocessed again for a smaller analysis zone lying within the larger one
+    if 'full_geometry_length' in var_gdf.columns:
+        full_lengths = var_gdf['full_geometry_length'].to_numpy()[candidate_idx]
+    else:
+        full_lengths = shp.length(geoms)
+
+    # drop features with no intersection geometry
+    # (iloc returns a new GDF, so the added columns never land on the caller's GDF)
+    has_intersect = ~(shp.is_empty(intersect_geoms) | shp.is_missing(intersect_geoms))
+    var_gdf = var_gdf.iloc[candidate_idx[has_intersect]].copy()
+    full_lengths = full_lengths[has_intersect]
+    intersect_geoms = intersect_geoms[has_intersect]
 
-    var_gdf = var_gdf[var_gdf['intersect_geom'].notna()].copy()
+    intersect_lengths = shp.length(intersect_geoms)
 
-    var_gdf['fire_intersect_ratio'] = (var_gdf['intersect_geom'].length / var_gdf['geometry'].length)
+    var_gdf['full_geometry_length'] = full_lengths
 
-    var_gdf['geometry'] = var_gdf['intersect_geom']
+    var_gdf['fire_intersect_ratio'] = intersect_lengths / full_lengths
 
-    var_gdf['geometry_feet'] = var_gdf['geometry'].length * 3.281
+    var_gdf['geometry'] = gpd.GeoSeries(intersect_geoms, index=var_gdf.index, crs=var_gdf.crs)
 
-    var_gdf = var_gdf.drop(columns=['intersect_geom'])
+    var_gdf['geometry_feet'] = intersect_lengths * 3.281
 
     return var_gdf
 
-def _run_acres_sum_by_attr(var_gdf, field):
-    acres_sum_attrs = {}
-    groups = var_gdf.groupby(field, dropna=False)
-    for g in groups:
-        grouped_value = g[0]
-        grouped_gdf = g[1]
-        if pd.isna(grouped_value) or grouped_value.strip() == "":
-            grouped_value = 'No Data'
-        area_acres = grouped_gdf['geometry_acres'].sum()
-        acres_sum_attrs[grouped_value] = round(area_acres, 2)
+def _preprocess_point_var_gdf(var_gdf: gpd.GeoDataFrame, fire_geometry: shp.Polygon | shp.MultiPolygon) -> gpd.GeoDataFrame:
+    '''
+    Prepares GDF of point features for subsequent analyses:
+    Keeps only the features within the fire analysis zone.
+    '''
+    # point analyses never read geometry, so features only need to be selected (not clipped)
+    # (the spatial index query selects the same features, in the same order, as gpd.clip())
+    return var_gdf.iloc[var_gdf.sindex.query(fire_geometry, predicate='intersects')]
+
+def _group_shared_fields(var_gdf, *field_lists):
+    '''
+    Groups var_gdf once by each field that appears in more than one of the field lists,
+    so the group keys are only hashed once for all of the analyses that use that field.
+    '''
+    field_lists = [set(fields) for fields in field_lists if fields]
+    shared_fields = {field for a, b in itertools.combinations(field_lists, 2) for field in a & b}
+    return {field: _groupby_attr(var_gdf, field) for field in shared_fields}
+
+def _groupby_attr(var_gdf, field):
+    # observed=True keeps categories that do not occur in this analysis zone out of the groups
+    # sort=False keeps groups in order of first appearance (the same order attribute counts have without a groupby),
+    # attributes are sorted by their values later by _sort_trim_attr_json()
+    return var_gdf.groupby(field, dropna=False, observed=True, sort=False)
+
+def _no_data_index(index: pd.Index, no_data_blanks: bool = True) -> pd.Series:
+    # null (and optionally blank) attribute values are relabeled as 'No Data'
+    # (casting to object first, since 'No Data' is not one of the categories of a categorical field)
+    index = index.astype(object).to_series().fillna('No Data')
+    return index.replace(r'^\s*$', 'No Data', regex=True) if no_data_blanks else index
+
+def _run_acres_sum_by_attr(var_gdf, field, grouped=None):
+    if grouped is None:
+        grouped = _groupby_attr(var_gdf, field)
+    acres_sums = grouped['geometry_acres'].sum()
+    # null and blank attribute values are reported (and summed) together as 'No Data'
+    acres_sums.index = _no_data_index(acres_sums.index)
+    acres_sum_attrs = acres_sums.groupby(level=0, sort=False).sum().round(2).to_dict()
     return acres_sum_attrs
 
-def _run_length_ft_sum_by_attr(var_gdf, field):
-    length_ft_sum_attrs = {}
-    groups = var_gdf.groupby(field, dropna=False)
-    for g in groups:
-        grouped_value = g[0]
-        grouped_gdf = g[1]
-        if pd.isna(grouped_value) or grouped_value.strip() == "":
-            grouped_value = 'No Data'
-        length_ft = grouped_gdf['geometry_feet'].sum()
-        length_ft_sum_attrs[grouped_value] = int(length_ft)
+def _run_length_ft_sum_by_attr(var_gdf, field, grouped=None):
+    if grouped is None:
+        grouped = _groupby_attr(var_gdf, field)
+    length_ft_sums = grouped['geometry_feet'].sum()
+    # null and blank attribute values are reported (and summed) together as 'No Data'
+    length_ft_sums.index = _no_data_index(length_ft_sums.index)
+    length_ft_sum_attrs = length_ft_sums.groupby(level=0, sort=False).sum().astype(int).to_dict()
     return length_ft_sum_attrs
 
-def _run_value_sum(var_gdf, field):
+def _run_attr_count(var_gdf, field, grouped=None, counter_max_feats: int = _COUNTER_MAX_FEATS):
+    # categorical fields (only cast for large inputs by _analyze_var_all_bufs()) are counted with a groupby, which works on their integer codes
+    if grouped is None and isinstance(var_gdf[field].dtype, pd.CategoricalDtype):
+        grouped = _groupby_attr(var_gdf, field)
+    if grouped is not None:
+        attr_counts = grouped.size()
+        attr_counts.index = _no_data_index(attr_counts.index, no_data_blanks=False)
+        return attr_counts.groupby(level=0, sort=False).sum().to_dict()
+    attr_values = var_gdf[field].fillna('No Data')
+    # Counter avoids pandas hashing and Series construction overhead for the small GDFs left after clipping to a fire buffer
+    # (tolist() keeps keys as python objects so they can be serialized)
+    if len(attr_values) < counter_max_feats:
+        return dict(Counter(attr_values.tolist()))
+    # counts are sorted later by _sort_trim_attr_json(), so value_counts() does not need to sort them
+    return attr_values.value_counts(dropna=False, sort=False).to_dict()
 
-    var_gdf.loc[:, field] = pd.to_numeric(var_gdf[field], errors='coerce')
+def _run_value_sum(var_gdf, field):
 
+    # field was already cast to numeric by _analyze_var_all_bufs()
     if 'fire_intersect_ratio' in var_gdf.columns:
         value_series = var_gdf['fire_intersect_ratio'] * var_gdf[field]
         value_sum = int(value_series.sum())
@@ -327,81 +440,76 @@ def _run_value_sum(var_gdf, field):
 
     return value_sum
 
-def _get_cardinal_direction(point_a, point_b):
+def _get_cardinal_directions(points_a: np.ndarray, points_b: np.ndarray) -> np.ndarray:
     '''
-    Calculates the 16-point cardinal direction between two Shapely points.
+    Calculates the 16-point cardinal direction between each pair of Shapely points in two equal length arrays.
 
     Args:
-        - point_a (shapely.geometry.Point): The starting point.
-        - point_b (shapely.geometry.Point): The ending point.
+        - points_a (np.ndarray): The starting points.
+        - points_b (np.ndarray): The ending points.
 
     Returns:
-        - str: The cardinal direction on a 16-point compass.
+        - np.ndarray: The cardinal direction on a 16-point compass for each pair of points.
     '''
-    dx = point_b.x - point_a.x
-    dy = point_b.y - point_a.y
+    coords_a = shp.get_coordinates(points_a)
+    coords_b = shp.get_coordinates(points_b)
 
-    # describe direction as "None" if point coordinates are identical
-    if dx == 0 and dy == 0:
-        return 'None'
+    dx = coords_b[:, 0] - coords_a[:, 0]
+    dy = coords_b[:, 1] - coords_a[:, 1]
 
-    angle = math.degrees(math.atan2(dy, dx))
+    angle = np.degrees(np.arctan2(dy, dx))
     compass_angle = (90 - angle) % 360
 
-    directions = [
+    directions = np.array([
         'N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE',
         'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW'
-    ]
+    ], dtype=object)
 
-    index = int((compass_angle + 11.25) / 22.5) % 16
+    index = ((compass_angle + 11.25) / 22.5).astype(int) % 16
 
-    return directions[index]
+    cardinal_directions = directions[index]
 
-def _dd_to_ddm_lat(coord):
-    degree_sign = u'\N{DEGREE SIGN}'
-    deg = abs(int(coord))
-    min = (abs(coord) - deg) * 60
-    if coord > 0:
-        dir = "N"
-    else:
-        dir = "S"
-    return "%s%s %s' %s"%(deg, degree_sign, "{:06.3f}".format(min), dir)
-
-def _dd_to_ddm_lng(coord):
-    degree_sign = u'\N{DEGREE SIGN}' 
-    deg = abs(int(coord))
-    min = (abs(coord) - deg) * 60
-    if coord > 0:
-        dir = "E"
-    else:
-        dir = "W"
-    return "%s%s %s' %s"%(deg, degree_sign, "{:06.3f}".format(min), dir)
+    # describe direction as "None" if point coordinates are identical
+    cardinal_directions[(dx == 0) & (dy == 0)] = 'None'
 
-def _get_lat_lng_ddm_from_3338_point(point_3338: shp.Point) -> tuple[str]:
+    return cardinal_directions
 
-    crs_3338 = CRS("EPSG:3338")
-    crs_4326 = CRS("EPSG:4326")
+def _dd_to_ddm(coords: np.ndarray, positive_dir: str, negative_dir: str) -> list[str]:
+    '''
+    Formats an array of decimal degree coordinates in DDM.
+    Degrees, minutes and direction are computed for the whole array at once, only the string formatting is done per coordinate.
+    '''
+    degree_sign = u'\N{DEGREE SIGN}'
+    degs = np.abs(np.trunc(coords)).astype(int)
+    mins = (np.abs(coords) - degs) * 60
+    dirs = np.where(coords > 0, positive_dir, negative_dir)
+    return ["%s%s %s' %s"%(deg, degree_sign, "{:06.3f}".format(min), dir) for deg, min, dir in zip(degs.tolist(), mins.tolist(), dirs.tolist())]
 
-    transformer = Transformer.from_crs(crs_3338, crs_4326)
+def _get_lat_lng_ddm_from_3338_points(points_3338: np.ndarray) -> tuple[list[str], list[str]]:
+    '''
+    Transforms an array of EPSG:3338 points to EPSG:4326 in a single call, then formats their coordinates in DDM.
 
-    x_4326, y_4326 = transformer.transform(point_3338.x, point_3338.y)
+    Returns:
+        - tuple[list[str], list[str]]: ( DDM latitudes , DDM longitudes ) in the same order as the input points.
+    '''
+    coords_3338 = shp.get_coordinates(points_3338)
 
-    point_4326 = shp.Point(x_4326, y_4326)
+    lngs_4326, lats_4326 = _TRANSFORMER_3338_TO_4326.transform(coords_3338[:, 0], coords_3338[:, 1])
 
-    ddm_lat = _dd_to_ddm_lat(point_4326.x)
+    ddm_lats = _dd_to_ddm(lats_4326, 'N', 'S')
 
-    ddm_lng = _dd_to_ddm_lng(point_4326.y)
+    ddm_lngs = _dd_to_ddm(lngs_4326, 'E', 'W')
 
-    return (ddm_lat, ddm_lng)
+    return (ddm_lats, ddm_lngs)
 
 def _nearest_feats_analysis(
     identifier: str,
     fire_geom: shp.Polygon | shp.MultiPolygon,
-    var_gdf: gpd.GeoDataFrame,
+    shared_var_gdf: _SharedGDF,
+    max_buf_geom: shp.Polygon | shp.MultiPolygon,
     var_alias: str,
-    included_fields: tuple,
-    manager_queue: multiprocessing.Queue
-    ) -> None:
+    included_fields: tuple
+    ) -> list[tuple]:
     '''
     Determines distance and direction from fires edge to nearest point for a value-at-risk.
     Calculates lat & lng for nearest point of value-at-risk in DDM.
@@ -412,201 +520,260 @@ def _nearest_feats_analysis(
     Arguments:
         * identifier -- GUID for a fire (IrwinID taken from WFIGS).
         * fire_geom -- Geometry for a fire.
-        * var_gdf -- All features for a specific input that intersect the maximum size buffer created for the fire.
+        * shared_var_gdf -- All features for a specific input returned by the bbox query for the fire.
+        * max_buf_geom -- Geometry for the maximum size buffer created for the fire, var_gdf is clipped to this before analysis.
         * var_alias -- Identifies the value-at-risk input data source.
         * included_fields -- Fields unique to the input GDF to include with the output attributes.
-        * manager_queue -- Holds all attribution tuples generated during multiprocessing analysis.
+
+    Returns:
+        * list[tuple] -- Attribution tuples formatted (IrwinID, buf_dist, attrName, attrVal).
     '''       
     try:
 
         attr_tups = []
 
+        # for consistency sake, only run analysis on the maximum size buffer geometry (not full bbox query result)
+        var_gdf = gpd.clip(shared_var_gdf.load(), max_buf_geom)
+
         # write null attribution if there are no features within max buffer analysis of the fire
         if len(var_gdf) < 1:
             attr_tups.extend([
                 (identifier, 0, f'{var_alias}_nearest_feats', None),
                 (identifier, 0, f'{var_alias}_interior_feats', None)
                 ])
-            manager_queue.put(attr_tups)
-            return
+            return attr_tups
 
-        # features that intersect the fire polygon will be considered interior
-        interior = var_gdf.intersects(fire_geom)
+        var_geoms = var_gdf['geometry'].to_numpy()
 
-        # intermediary var_prox_df
-        # will include index and columns required for assessing proximity
-        var_prox_df = pd.DataFrame({'interior': interior})
+        # features that intersect the fire polygon will be considered interior
+        # (the spatial index only runs the intersects predicate on features whose bounding box overlaps the fire)
+        interior = np.zeros(len(var_geoms), dtype=bool)
+        interior[var_gdf.sindex.query(fire_geom, predicate='intersects')] = True
 
-        # determine nearest points for the value-at-risk and along fires edge
-        var_prox_df[['var_nearest_pt','fire_nearest_pt']] = var_gdf['geometry'].apply(
-            lambda x: pd.Series(shp.ops.nearest_points(x, fire_geom.boundary))
-        )
+        # determine distance in meters from each value-at-risk to the fires edge, and in miles
+        # (only distances are needed to rank every feature, nearest points are found later for the features that are kept)
+        fire_edge = fire_geom.boundary
+        meters = shp.distance(var_geoms, fire_edge)
+        dist_mi = np.round(meters / 1609.34, 2)
 
-        # determine distance in meters between nearest points
-        var_prox_df['meters'] = var_prox_df.apply(
-            lambda x: shp.distance(x['var_nearest_pt'], x['fire_nearest_pt']),
-            axis=1
-        )
-        
-        # handling interior features
-        # truncating those furthest from the fires edge, saving baseline popped & cutoff variables
-        interior_var_prox_df = var_prox_df[var_prox_df['interior'] == True].copy().sort_values(by='meters', ascending=True)
-        interior_var_total_feats = len(interior_var_prox_df)
-        # considering 50 features a safe upper limit for how many could possibly be serialized to 5000 characters or under
-        interior_var_prox_df = interior_var_prox_df[:50]
-        interior_var_popped = interior_var_total_feats - len(interior_var_prox_df)
-        interior_var_cutoff = round((interior_var_prox_df.iloc[-1]['meters'] / 1609.34), 2) if interior_var_popped > 0 else None
+        # positions of interior and non-interior features, ordered from nearest to furthest from the fires edge
+        by_distance = np.argsort(meters, kind='stable')
+        interior_total_idx = by_distance[interior[by_distance]]
+        nearest_total_idx = by_distance[~interior[by_distance]]
 
-        # handling nearest features
         # truncating those furthest from the fires edge, saving baseline popped & cutoff variables
-        nearest_var_prox_df = var_prox_df[var_prox_df['interior'] != True].copy().sort_values(by='meters', ascending=True)
-        nearest_var_total_feats = len(nearest_var_prox_df)
         # considering 50 features a safe upper limit for how many could possibly be serialized to 5000 characters or under
-        nearest_var_prox_df = nearest_var_prox_df[:50]
-        nearest_var_popped = nearest_var_total_feats - len(nearest_var_prox_df)
-        nearest_var_cutoff = round((nearest_var_prox_df.iloc[-1]['meters'] / 1609.34), 2) if nearest_var_popped > 0 else None
-
-        # fully attributed var_prox_df
-        # to be used for analysis and for generating nearest features and interior features lists
-        var_prox_df = pd.concat([interior_var_prox_df, nearest_var_prox_df], axis=0)
-        var_prox_df = pd.merge(var_gdf, var_prox_df, left_index=True, right_index=True)
-
-        # calculate distance in miles
-        var_prox_df['dist_mi'] = var_prox_df['meters'] / 1609.34
-        var_prox_df['dist_mi'] = var_prox_df['dist_mi'].round(2)
-
-        # fill missing values (var_gdf can be unpredictably attributed)
-        var_prox_df = var_prox_df.astype('object')
-        var_prox_df.fillna(value='No Data', inplace=True)
-
-        # get var coordinates in DDM
-        var_prox_df[['lat','lng']] = var_prox_df['var_nearest_pt'].apply(
-            lambda x: pd.Series(_get_lat_lng_ddm_from_3338_point(x))
-        )
-
-        # get cardinal direction between nearest points for non-interior var features
-        var_prox_df.loc[var_prox_df['interior'] != True, 'dir'] = var_prox_df[var_prox_df['interior'] != True].apply(
-            lambda x: _get_cardinal_direction(x['fire_nearest_pt'], x['var_nearest_pt']),
-            axis=1
-        )
-
-        # describing the direction of features that intersect the fire as "Interior"
-        var_prox_df.loc[var_prox_df['interior'] == True, 'dir'] = 'Interior'
-
-        # organize output attributes
         # by placing 'dist_mi' at index 0, in the future json formatted attributes can easily be sorted by this key
-        var_prox_df = var_prox_df[['dist_mi', 'dir', 'lat', 'lng', *included_fields]]
-
-        # create _interior_feats attributes
-        interior_feats_df = var_prox_df[var_prox_df['dir'] == 'Interior'].sort_values(by='dist_mi', ascending=True)
-        interior_feats = [feat._asdict() for feat in interior_feats_df.itertuples(index=False)]
-        if interior_feats:
-            interior_fset = {
-                'features': interior_feats,
-                'popped': interior_var_popped,
-                'cutoff': interior_var_cutoff
+        feat_fields = ['dist_mi', 'dir', 'lat', 'lng', *included_fields]
+        for fset_name, total_idx in (('interior_feats', interior_total_idx), ('nearest_feats', nearest_total_idx)):
+
+            if len(total_idx) < 1:
+                attr_tups.append((identifier, 0, f'{var_alias}_{fset_name}', None))
+                continue
+
+            idx = total_idx[:50]
+            popped = len(total_idx) - len(idx)
+            cutoff = round((meters[idx[-1]] / 1609.34), 2) if popped > 0 else None
+
+            # determine nearest points for the value-at-risk and along fires edge
+            # each shortest line starts on the value-at-risk and ends on the fires edge
+            nearest_lines = shp.shortest_line(var_geoms[idx], fire_edge)
+            nearest_coords = shp.get_coordinates(nearest_lines).reshape(-1, 2, 2)
+            var_nearest_pt = shp.points(nearest_coords[:, 0])
+            fire_nearest_pt = shp.points(nearest_coords[:, 1])
+
+            # get var coordinates in DDM
+            lats, lngs = _get_lat_lng_ddm_from_3338_points(var_nearest_pt)
+
+            # describing the direction of features that intersect the fire as "Interior"
+            # otherwise get cardinal direction between nearest points
+            if fset_name == 'interior_feats':
+                dirs = ['Interior'] * len(idx)
+            else:
+                dirs = _get_cardinal_directions(fire_nearest_pt, var_nearest_pt).tolist()
+
+            # fill missing values (var_gdf can be unpredictably attributed)
+            # only columns with missing values get cast to object so any dtype can hold 'No Data'
+            fields_df = var_gdf.iloc[idx][list(included_fields)]
+            fill_fields = [field for field in included_fields if fields_df[field].isna().any()]
+            if fill_fields:
+                fields_df = fields_df.astype({field: 'object' for field in fill_fields}).fillna({field: 'No Data' for field in fill_fields})
+
+            # features are already ordered by distance
+            feats = [
+                dict(zip(feat_fields, (*feat, *fields)))
+                for feat, fields in zip(zip(dist_mi[idx].tolist(), dirs, lats, lngs), fields_df.itertuples(index=False, name=None))
+            ]
+            fset = {
+                'features': feats,
+                'popped': popped,
+                'cutoff': cutoff
             }
-            interior_fset_serialized = _trim_nearest_feats(interior_fset)
-            attr_tups.append((identifier, 0, f'{var_alias}_interior_feats', interior_fset_serialized))
-        else:
-            attr_tups.append((identifier, 0, f'{var_alias}_interior_feats', None))
-
-        # create _nearest_feats attributes
-        nearest_feats_df = var_prox_df[var_prox_df['dir'] != 'Interior'].sort_values(by='dist_mi', ascending=True)
-        nearest_feats = [feat._asdict() for feat in nearest_feats_df.itertuples(index=False)]
-        if nearest_feats:
-            nearest_fset = {
-                'features': nearest_feats,
-                'popped': nearest_var_popped,
-                'cutoff': nearest_var_cutoff
-            }
-            nearest_fset_serialized = _trim_nearest_feats(nearest_fset)
-            attr_tups.append((identifier, 0, f'{var_alias}_nearest_feats', nearest_fset_serialized))
-        else:
-            attr_tups.append((identifier, 0, f'{var_alias}_nearest_feats', None))
+            attr_tups.append((identifier, 0, f'{var_alias}_{fset_name}', _trim_nearest_feats(fset)))
 
-        manager_queue.put(attr_tups)
+        return attr_tups
 
     except Exception as e:
         attr_tups = [
             (identifier, 0, f'{var_alias}_nearest_feats', (type(e), format_logged_exception(type(e), e, e.__traceback__))),
             (identifier, 0, f'{var_alias}_interior_feats', (type(e), format_logged_exception(type(e), e, e.__traceback__)))
         ]
-        manager_queue.put(attr_tups)
-
-def _trim_nearest_feats(nearest_feats_fset: dict) -> str:
+        return attr_tups
 
-    # return full serialized object right away if size is acceptable
-    # otherwise continue to binary search logic
-    full_serialized = json.dumps(nearest_feats_fset)
-    if len(full_serialized) <= 5000:
-        return full_serialized
+def _trim_nearest_feats(nearest_feats_fset: dict, max_length: int = 5000) -> str:
 
-    # going to search between 0 and len(features) to find 
-    # the maximum number of features that can be serialized into the required string length
     features = nearest_feats_fset['features']
-    low = 0
-    high = len(features)
 
     # baseline values for popped and cutoff
     popped_base = nearest_feats_fset['popped']
     cutoff_base = nearest_feats_fset['cutoff']
 
-    while low < high:
-
-        # retreive subset of features up to the middle index between the current low and high values
-        mid = (low + high) // 2
-        test_subset = features[:mid]
-
-        # produce test json structure based on feature subset
-        test_dict = {
-            'features': test_subset,
-            'popped': (len(features) - mid) + popped_base,
-            'cutoff': features[mid - 1]['dist_mi'] if mid < len(features) else cutoff_base
-        }
-        test_serialized = json.dumps(test_dict)
-        
-        # feature subset is an acceptable size, establishing the index of the last feature of the subset +1 as our new low value
-        if len(test_serialized) <= 5000:
-            best_serialized = test_serialized
-            low = mid + 1
-
-        # feature subset was too large, establishing the index of the last feature of the subset as our new high value
-        else:
-            high = mid
-
-    return best_serialized
-
-# this can be optimized using binary search logic from _trim_nearest_feats()
-# however _sort_trim_attr_json() is very rarely passed attr_json that needs to be trimmed, and even more rarely attr_json that is well over 5000 chars serialized
+    # each feature is serialized once, and the serialized length of any subset of features is then found by summing
+    # (_json_dumps() separates list items with ', ', and writes the structure keys in the order features, popped, cutoff)
+    serialized_feats = [_json_dumps(feat) for feat in features]
+    feats_lengths = [0, *itertools.accumulate(len(feat) + 2 for feat in serialized_feats)]
+
+    def subset_popped_cutoff(mid: int) -> tuple[str, str]:
+        popped = (len(features) - mid) + popped_base
+        cutoff = features[mid - 1]['dist_mi'] if mid < len(features) else cutoff_base
+        return _json_dumps(popped), _json_dumps(cutoff)
+
+    def subset_length(mid: int) -> int:
+        popped, cutoff = subset_popped_cutoff(mid)
+        feats_length = feats_lengths[mid] - 2 if mid > 0 else 0
+        return len('{"features": [], "popped": , "cutoff": }') + feats_length + len(popped) + len(cutoff)
+
+    # keep the full set of features right away if size is acceptable
+    # otherwise continue to binary search logic
+    if subset_length(len(features)) <= max_length:
+        best_mid = len(features)
+
+    else:
+        # going to search between 0 and len(features) to find
+        # the maximum number of features that can be serialized into the required string length
+        low = 0
+        high = len(features)
+        best_mid = 0
+
+        while low < high:
+
+            # test the subset of features up to the middle index between the current low and high values
+            mid = (low + high) // 2
+
+            # feature subset is an acceptable size, establishing the index of the last feature of the subset +1 as our new low value
+            if subset_length(mid) <= max_length:
+                best_mid = mid
+                low = mid + 1
+
+            # feature subset was too large, establishing the index of the last feature of the subset as our new high value
+            else:
+                high = mid
+
+    # the winning subset is the only one actually assembled
+    popped, cutoff = subset_popped_cutoff(best_mid)
+    return f'{{"features": [{", ".join(serialized_feats[:best_mid])}], "popped": {popped}, "cutoff": {cutoff}}}'
+
 def _sort_trim_attr_json(attr_json: dict, max_length: int = 5000) -> str:
     '''
     Sorts JSON formatted attribute by its values in descending order.
-    Shortens JSON one k,v pair at a time while its serialized length exceeds specified max_length.
+    Shortens JSON to the largest number of leading k,v pairs whose serialized length does not exceed specified max_length.
     '''
-    attr_json_sorted = dict(sorted(attr_json.items(), key=lambda item: item[1], reverse=True))   
+    attr_items_sorted = sorted(attr_json.items(), key=lambda item: item[1], reverse=True)
 
-    attr_json_serialized = json.dumps(attr_json_sorted)
+    # each k,v pair is serialized once, and the serialized length of any leading subset of pairs is then found by summing
+    # (_json_dumps() wraps pairs in braces and separates them with ', ', so every pair adds its own length + 2)
+    serialized_items = [_json_dumps(dict([item]))[1:-1] for item in attr_items_sorted]
+    subset_lengths = [len('{}'), *itertools.accumulate(len(item) + 2 for item in serialized_items)]
 
-    while len(attr_json_serialized) > max_length:
-        attr_json_sorted.popitem()
-        attr_json_serialized = json.dumps(attr_json_sorted)
+    # subset lengths only grow, so the largest acceptable subset is found with a binary search
+    best_mid = bisect.bisect_right(subset_lengths, max_length) - 1
 
-    return attr_json_serialized
+    # the winning subset is the only one actually assembled
+    return f'{{{", ".join(serialized_items[:best_mid])}}}'
 
-def _analyze_poly_var(identifier, fire_geometry, buf_dist, var_gdf, var_alias, analysis_types, manager_queue):
+def _analyze_var_all_bufs(
+    identifier: str,
+    geoms_by_buf: dict,
+    shared_var_gdf: _SharedGDF,
+    var_alias: str,
+    analysis_types: dict,
+    preprocess_var: Callable,
+    analyze_var: Callable
+    ) -> list[tuple]:
+    '''
+    Runs the analysis for a value-at-risk input on every buffer ring of a fire within one task.
+    Buffer rings are nested, so var_gdf is preprocessed against the largest ring once,
+    and each smaller ring only preprocesses the features (and portions of their geometry) left after that.
+
+    Arguments:
+        * identifier -- GUID for a fire (IrwinID taken from WFIGS).
+        * geoms_by_buf -- { buf_dist : fire geometry } for the fire and each of its buffers.
+        * shared_var_gdf -- All features for a specific input returned by the bbox query for the fire.
+        * var_alias -- Identifies the value-at-risk input data source.
+        * analysis_types -- Analyses to run (and attributes to analyze) for the value-at-risk input.
+        * preprocess_var -- One of _preprocess_poly_var_gdf(), _preprocess_line_var_gdf() or _preprocess_point_var_gdf().
+        * analyze_var -- One of _analyze_poly_var(), _analyze_line_var() or _analyze_point_var().
+
+    Returns:
+        * list[tuple] -- Attribution tuples formatted (IrwinID, buf_dist, attrName, attrVal) for every buffer ring.
+    '''
+    max_buf_dist = max(geoms_by_buf)
 
     try:
+        # fields are cast in place below, and point preprocessing returns a slice of the loaded GDF, so the max ring gets its own copy
+        max_buf_var_gdf = preprocess_var(shared_var_gdf.load(), geoms_by_buf[max_buf_dist]).copy()
+
+        # value sum fields are cast to numeric once, every ring inherits the cast values from the max ring
+        # (a missing field is left for _run_value_sum() to report)
+        for field in analysis_types.get('VALUE_SUM_FIELDS', ()):
+            if field in max_buf_var_gdf.columns:
+                max_buf_var_gdf[field] = pd.to_numeric(max_buf_var_gdf[field], errors='coerce')
+
+        # for large inputs, fields grouped on every ring are cast to categorical once, so each groupby builds groups from integer codes
+        # rather than hashing the attribute values again.
+        # small inputs are left as they are, so that _run_attr_count() can count them with a Counter
+        if len(max_buf_var_gdf) >= _COUNTER_MAX_FEATS:
+            group_fields = {
+                field
+                for key in ('ACRES_SUM_FIELDS', 'LENGTH_FT_SUM_FIELDS', 'ATTR_COUNT_FIELDS')
+                for field in analysis_types.get(key, ())
+                if field in max_buf_var_gdf.columns
+            }
+            for field in group_fields.difference(analysis_types.get('VALUE_SUM_FIELDS', ())):
+                max_buf_var_gdf[field] = max_buf_var_gdf[field].astype('category')
+
+    except Exception as e:
+        attr_tups = []
+        for buf_dist in geoms_by_buf:
+            attr_tups.extend(batch_write_attr_tups(identifier, buf_dist, var_alias, analysis_types, (type(e), format_logged_exception(type(e), e, e.__traceback__))))
+        return attr_tups
+
+    attr_tups = []
+    for buf_dist, fire_geometry in geoms_by_buf.items():
+
+        try:
+            var_gdf = max_buf_var_gdf if buf_dist == max_buf_dist else preprocess_var(max_buf_var_gdf, fire_geometry)
+        except Exception as e:
+            attr_tups.extend(batch_write_attr_tups(identifier, buf_dist, var_alias, analysis_types, (type(e), format_logged_exception(type(e), e, e.__traceback__))))
+            continue
+
+        attr_tups.extend(analyze_var(identifier, buf_dist, var_gdf, var_alias, analysis_types))
+
+    return attr_tups
 
-        var_gdf = _preprocess_poly_var_gdf(var_gdf, fire_geometry)
+def _analyze_poly_var(identifier, buf_dist, var_gdf, var_alias, analysis_types):
+
+    try:
 
         if len(var_gdf) < 1:
             attr_tups = batch_write_attr_tups(identifier, buf_dist, var_alias, analysis_types)
-            manager_queue.put(attr_tups)
-            return
+            return attr_tups
 
         attr_tups = []
 
+        # fields used by both acres sums and attribute counts share a single groupby
+        grouped_by_field = _group_shared_fields(var_gdf, analysis_types.get('ACRES_SUM_FIELDS'), analysis_types.get('ATTR_COUNT_FIELDS'))
+
         if 'FEATURE_COUNT' in analysis_types:
 
             try:
@@ -628,7 +795,7 @@ def _analyze_poly_var(identifier, fire_geometry, buf_dist, var_gdf, var_alias, a
             for field in analysis_types['ACRES_SUM_FIELDS']:
 
                 try:
-                    acres_sum_by_attr = _run_acres_sum_by_attr(var_gdf, field)
+                    acres_sum_by_attr = _run_acres_sum_by_attr(var_gdf, field, grouped_by_field.get(field))
                     acres_sum_by_attr_str = _sort_trim_attr_json(acres_sum_by_attr)
                     attr_tups.append((identifier, buf_dist, f'{var_alias}_{field}_acres_sum', acres_sum_by_attr_str))
                 except Exception as e:
@@ -651,32 +818,32 @@ def _analyze_poly_var(identifier, fire_geometry, buf_dist, var_gdf, var_alias, a
             for field in analysis_types['ATTR_COUNT_FIELDS']:
 
                 try:
-                    count_by_attr = var_gdf[field].fillna('No Data').value_counts(dropna=False).to_dict()
+                    count_by_attr = _run_attr_count(var_gdf, field, grouped_by_field.get(field))
                     count_by_attr_str = _sort_trim_attr_json(count_by_attr)
                     attr_tups.append((identifier, buf_dist, f'{var_alias}_{field}_attr_count', count_by_attr_str))
                 except Exception as e:
                     attr_tups.append((identifier, buf_dist, f'{var_alias}_{field}_attr_count', (type(e), format_logged_exception(type(e), e, e.__traceback__))))
 
 
-        manager_queue.put(attr_tups)
+        return attr_tups
 
     except Exception as e:
         attr_tups = batch_write_attr_tups(identifier, buf_dist, var_alias, analysis_types, (type(e), format_logged_exception(type(e), e, e.__traceback__)))
-        manager_queue.put(attr_tups)
+        return attr_tups
 
-def _analyze_line_var(identifier, fire_geometry, buf_dist, var_gdf, var_alias, analysis_types, manager_queue):
+def _analyze_line_var(identifier, buf_dist, var_gdf, var_alias, analysis_types):
 
     try:
 
-        var_gdf = _preprocess_line_var_gdf(var_gdf, fire_geometry)
-
         if len(var_gdf) < 1:
             attr_tups = batch_write_attr_tups(identifier, buf_dist, var_alias, analysis_types)
-            manager_queue.put(attr_tups)
-            return
+            return attr_tups
 
         attr_tups = []
 
+        # fields used by both length sums and attribute counts share a single groupby
+        grouped_by_field = _group_shared_fields(var_gdf, analysis_types.get('LENGTH_FT_SUM_FIELDS'), analysis_types.get('ATTR_COUNT_FIELDS'))
+
         if 'TOTAL_LENGTH_FT' in analysis_types:
 
             try:
@@ -690,7 +857,7 @@ def _analyze_line_var(identifier, fire_geometry, buf_dist, var_gdf, var_alias, a
             for field in analysis_types['LENGTH_FT_SUM_FIELDS']:
 
                 try:
-                    length_ft_sum_by_attr = _run_length_ft_sum_by_attr(var_gdf, field)
+                    length_ft_sum_by_attr = _run_length_ft_sum_by_attr(var_gdf, field, grouped_by_field.get(field))
                     length_ft_sum_by_attr_str = _sort_trim_attr_json(length_ft_sum_by_attr)
                     attr_tups.append((identifier, buf_dist, f'{var_alias}_{field}_feet_sum', length_ft_sum_by_attr_str))
                 except Exception as e:
@@ -713,28 +880,25 @@ def _analyze_line_var(identifier, fire_geometry, buf_dist, var_gdf, var_alias, a
             for field in analysis_types['ATTR_COUNT_FIELDS']:
 
                 try:
-                    count_by_attr = var_gdf[field].fillna('No Data').value_counts(dropna=False).to_dict()
+                    count_by_attr = _run_attr_count(var_gdf, field, grouped_by_field.get(field))
                     count_by_attr_str = _sort_trim_attr_json(count_by_attr)
                     attr_tups.append((identifier, buf_dist, f'{var_alias}_{field}_attr_count', count_by_attr_str))                    
                 except Exception as e:
                     attr_tups.append((identifier, buf_dist, f'{var_alias}_{field}_attr_count', (type(e), format_logged_exception(type(e), e, e.__traceback__))))
 
-        manager_queue.put(attr_tups)
+        return attr_tups
     
     except Exception as e:
         attr_tups = batch_write_attr_tups(identifier, buf_dist, var_alias, analysis_types, (type(e), format_logged_exception(type(e), e, e.__traceback__)))
-        manager_queue.put(attr_tups)
+        return attr_tups
 
-def _analyze_point_var(identifier, fire_geometry, buf_dist, var_gdf, var_alias, analysis_types, manager_queue):
+def _analyze_point_var(identifier, buf_dist, var_gdf, var_alias, analysis_types):
 
     try:
 
-        var_gdf = gpd.clip(var_gdf, fire_geometry)
-
         if len(var_gdf) < 1:
             attr_tups = batch_write_attr_tups(identifier, buf_dist, var_alias, analysis_types)
-            manager_queue.put(attr_tups)
-            return
+            return attr_tups
 
         attr_tups = []
 
@@ -762,15 +926,15 @@ def _analyze_point_var(identifier, fire_geometry, buf_dist, var_gdf, var_alias,
             for field in analysis_types['ATTR_COUNT_FIELDS']:
 
                 try:
-                    count_by_attr = var_gdf[field].fillna('No Data').value_counts(dropna=False).to_dict()
+                    count_by_attr = _run_attr_count(var_gdf, field)
                     count_by_attr_str = _sort_trim_attr_json(count_by_attr)
                     attr_tups.append((identifier, buf_dist, f'{var_alias}_{field}_attr_count', count_by_attr_str))                    
                 except Exception as e:
                     attr_tups.append((identifier, buf_dist, f'{var_alias}_{field}_attr_count', (type(e), format_logged_exception(type(e), e, e.__traceback__))))
 
 
-        manager_queue.put(attr_tups)
+        return attr_tups
 
     except Exception as e:
         attr_tups = batch_write_attr_tups(identifier, buf_dist, var_alias, analysis_types, (type(e), format_logged_exception(type(e), e, e.__traceback__)))
-        manager_queue.put(attr_tups)
\ No newline at end of file
+        return attr_tups
\ No newline at end of file
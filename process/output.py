@@ -1,16 +1,18 @@
-from arcgis.features import FeatureSet
 import asyncio
 import geopandas as gpd
-import json
 import numpy as np
 import pandas as pd
 import pathlib
 import sys
+from typing import Iterable
 
 proj_root = pathlib.Path(__file__).parent.parent
 sys.path.append(proj_root)
 
-from utils.arcgis_helpers import AsyncArcGISRequester, assign_wkid_3338
+from utils.arcgis_helpers import AsyncArcGISRequester, gdf_to_arcgis_polygon_features
+
+# result lists in an applyEdits response
+APPLY_EDITS_RESULT_TYPES = ('addResults', 'updateResults', 'deleteResults')
 
 def format_fields(fires_bufs_attrs_gdf: gpd.GeoDataFrame, schema_plan: pd.DataFrame) -> gpd.GeoDataFrame:
     '''
@@ -26,19 +28,22 @@ def format_fields(fires_bufs_attrs_gdf: gpd.GeoDataFrame, schema_plan: pd.DataFr
 
     fires_bufs_attrs_gdf = _write_default_label(fires_bufs_attrs_gdf)
 
-    fires_bufs_attrs_gdf['HasError'] = 0
+    fires_bufs_attrs_gdf['HasError'] = np.int8(0)
 
     rename_dict = dict(zip(schema_plan['PROCESSING_NAME'], schema_plan['FIELD_NAME']))
 
     fires_bufs_attrs_gdf.rename(rename_dict, axis=1, inplace=True)
 
-    esri_string_cols = schema_plan[schema_plan['ESRI_FIELD_TYPE'] == 'esriFieldTypeString']['FIELD_NAME']
+    # field names are split by field type in a single pass over the schema plan
+    cols_by_type = schema_plan.groupby('ESRI_FIELD_TYPE', sort=False)['FIELD_NAME'].agg(list).to_dict()
+
+    esri_string_cols = cols_by_type.get('esriFieldTypeString', [])
 
-    esri_small_integer_cols = schema_plan[schema_plan['ESRI_FIELD_TYPE'] == 'esriFieldTypeSmallInteger']['FIELD_NAME']
+    esri_small_integer_cols = cols_by_type.get('esriFieldTypeSmallInteger', [])
 
-    esri_integer_cols = schema_plan[schema_plan['ESRI_FIELD_TYPE'] == 'esriFieldTypeInteger']['FIELD_NAME']
+    esri_integer_cols = cols_by_type.get('esriFieldTypeInteger', [])
 
-    esri_double_cols = schema_plan[schema_plan['ESRI_FIELD_TYPE'] == 'esriFieldTypeDouble']['FIELD_NAME']
+    esri_double_cols = cols_by_type.get('esriFieldTypeDouble', [])
 
     ## string formatting
     fires_bufs_attrs_gdf[esri_string_cols] = fires_bufs_attrs_gdf[esri_string_cols].astype('string')
@@ -50,9 +55,8 @@ def format_fields(fires_bufs_attrs_gdf: gpd.GeoDataFrame, schema_plan: pd.DataFr
         '!UNEXPECTED!': '!error!',
         '!ANALYSISERROR!': '!error!'
     }
-    fires_bufs_attrs_gdf[esri_string_cols] = fires_bufs_attrs_gdf[esri_string_cols].replace(string_replace_dict)
 
-    ## small integer formatting
+    ## small integer & integer formatting
     int_small_int_replace_dict = {
         0: pd.NA,
         '!EXCEPTION!': -1,
@@ -64,15 +68,6 @@ def format_fields(fires_bufs_attrs_gdf: gpd.GeoDataFrame, schema_plan: pd.DataFr
     # some small integer columns need to retain 0 as a value
     small_int_nullable_cols = [col for col in esri_small_integer_cols if col not in ('AnalysisBufferMiles', 'ReportedAcOverPerimAc', 'HasError')]
 
-    fires_bufs_attrs_gdf[small_int_nullable_cols] = fires_bufs_attrs_gdf[small_int_nullable_cols].replace(int_small_int_replace_dict)
-    fires_bufs_attrs_gdf[esri_small_integer_cols] = fires_bufs_attrs_gdf[esri_small_integer_cols].apply(pd.to_numeric, errors='coerce')
-    fires_bufs_attrs_gdf[esri_small_integer_cols] = fires_bufs_attrs_gdf[esri_small_integer_cols].astype('Int16')
-
-    ## integer formatting
-    fires_bufs_attrs_gdf[esri_integer_cols] = fires_bufs_attrs_gdf[esri_integer_cols].replace(int_small_int_replace_dict)
-    fires_bufs_attrs_gdf[esri_integer_cols] = fires_bufs_attrs_gdf[esri_integer_cols].apply(pd.to_numeric, errors='coerce')
-    fires_bufs_attrs_gdf[esri_integer_cols] = fires_bufs_attrs_gdf[esri_integer_cols].astype('Int32')
-
     ## double formatting
     double_replace_dict = {
         0.0: np.nan,
@@ -81,14 +76,31 @@ def format_fields(fires_bufs_attrs_gdf: gpd.GeoDataFrame, schema_plan: pd.DataFr
         '!UNEXPECTED!': -1,
         '!ANALYSISERROR!': -1
     }
-    fires_bufs_attrs_gdf[esri_double_cols] = fires_bufs_attrs_gdf[esri_double_cols].replace(double_replace_dict)
-    fires_bufs_attrs_gdf[esri_double_cols] = fires_bufs_attrs_gdf[esri_double_cols].apply(pd.to_numeric, errors='coerce')
-    fires_bufs_attrs_gdf[esri_double_cols] = fires_bufs_attrs_gdf[esri_double_cols].astype('float64')
+
+    # replacements differ by field type, so they are keyed by column and all made in a single replace
+    fires_bufs_attrs_gdf.replace(
+        {
+            **{col: string_replace_dict for col in esri_string_cols},
+            **{col: int_small_int_replace_dict for col in small_int_nullable_cols},
+            **{col: int_small_int_replace_dict for col in esri_integer_cols},
+            **{col: double_replace_dict for col in esri_double_cols}
+        },
+        inplace=True
+    )
+
+    _cast_numeric(fires_bufs_attrs_gdf, esri_small_integer_cols, 'Int16')
+    _cast_numeric(fires_bufs_attrs_gdf, esri_integer_cols, 'Int32')
+    _cast_numeric(fires_bufs_attrs_gdf, esri_double_cols, 'float64')
 
     ## HasError attribution
     # if a single record has any error, all records sharing that IrwinID will receive HasError = 1. 
-    error_condition = (fires_bufs_attrs_gdf == '!error!') | (fires_bufs_attrs_gdf == -1)
-    irwins_with_errors = fires_bufs_attrs_gdf[error_condition.any(axis=1)]['wfigs_IrwinID']
+    # only string fields can hold '!error!' and only numeric fields can hold -1, so just those fields are compared
+    esri_numeric_cols = [*esri_small_integer_cols, *esri_integer_cols, *esri_double_cols]
+    error_condition = (
+        fires_bufs_attrs_gdf[esri_string_cols].eq('!error!').any(axis=1) |
+        fires_bufs_attrs_gdf[esri_numeric_cols].eq(-1).any(axis=1)
+    )
+    irwins_with_errors = fires_bufs_attrs_gdf.loc[error_condition, 'wfigs_IrwinID'].unique()
     fires_bufs_attrs_gdf.loc[fires_bufs_attrs_gdf['wfigs_IrwinID'].isin(irwins_with_errors), 'HasError'] = 1
 
     ## final column ordering
@@ -111,16 +123,14 @@ def create_output_feature_lists(fires_bufs_attrs_gdf: gpd.GeoDataFrame) -> dict[
     # will hold {buf_dist : feature_json_list} pairs, to be returned
     feat_dict = {}
 
-    gdf_groups = fires_bufs_attrs_gdf.groupby('AnalysisBufferMiles')
+    # groups are only looked up by buf_dist, so they don't need to be sorted
+    gdf_groups = fires_bufs_attrs_gdf.groupby('AnalysisBufferMiles', sort=False, observed=True)
     for group in gdf_groups:
         buf_dist = group[0]
         gdf = group[1]
 
-        #^ should write an arcgis helper that reads gdf crs, converts to arcgis json, assigns gdf crs to json feats
-        geojson = json.loads(gdf.to_json())
-        feature_set = FeatureSet.from_geojson(geojson).to_dict()
-        # arcgis ignores the crs property of geojson, so we must set the spatial reference for our features explicitly
-        features_3338 = [assign_wkid_3338(feature) for feature in feature_set['features']]
+        # features are converted straight to arcgis json, with the spatial reference of the gdf written to each feature
+        features_3338 = gdf_to_arcgis_polygon_features(gdf, wkid=3338)
 
         feat_dict[buf_dist] = features_3338
 
@@ -179,11 +189,11 @@ def find_apply_edits_failure(all_edits_response: list[dict]) -> list[tuple | dic
     for result_group in all_edits_response:
         if 'error' in result_group:
             failures.append(result_group)
-            continue
-        for result_type in ['addResults', 'updateResults', 'deleteResults']:
-            for item in result_group.get(result_type, []):
-                if item.get('success') == False:
-                    failures.append((result_type, item))
+        else:
+            failures.extend(
+                (result_type, item) for result_type in APPLY_EDITS_RESULT_TYPES
+                for item in result_group.get(result_type, ()) if item.get('success') == False
+            )
     return failures
 
 def find_apply_edits_success(all_edits_response: list[dict]) -> list[tuple]:
@@ -196,28 +206,34 @@ def find_apply_edits_success(all_edits_response: list[dict]) -> list[tuple]:
     Returns:
         * list[tuple] -- Contains tuples of (result type, result objects where {'success': True})
     '''    
-    successes = []
-    for result_group in all_edits_response:
-        for result_type in ['addResults', 'updateResults', 'deleteResults']:
-            for item in result_group.get(result_type, []):
-                if item.get('success') == True:
-                    successes.append((result_type, item))
+    successes = [
+        (result_type, item) for result_group in all_edits_response for result_type in APPLY_EDITS_RESULT_TYPES
+        for item in result_group.get(result_type, ()) if item.get('success') == True
+    ]
     return successes
 
+def _cast_numeric(fires_bufs_attrs_gdf: gpd.GeoDataFrame, cols: Iterable[str], dtype: str) -> None:
+    '''
+    Casts columns to a numeric dtype in place, values that can not be parsed as numbers become null.
+    '''
+    # columns that already have the target dtype are skipped,
+    # the rest are parsed and cast in a single assignment
+    dtype = pd.api.types.pandas_dtype(dtype)
+    cast_cols = [col for col in cols if fires_bufs_attrs_gdf[col].dtype != dtype]
+    if cast_cols:
+        fires_bufs_attrs_gdf[cast_cols] = fires_bufs_attrs_gdf[cast_cols].apply(pd.to_numeric, errors='coerce').astype(dtype)
+
 def _write_default_label(fires_bufs_attrs_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
 
-    fires_bufs_attrs_gdf['DefaultLabel'] = None
-    for idx, row in fires_bufs_attrs_gdf.iterrows():
-        fire_number = row['AkFireNumber']
-        fire_name = row['IncidentName']
-        if row['buf_dist'] == 0:
-            if pd.isna(row['GISAcres']):
-                geom_class = 'Reported Location'
-            else:
-                geom_class = 'Perimeter'
-        else:
-            geom_class = f'{row['buf_dist']} Mile Buffer'
+    # fires are labeled as perimeters or reported locations, buffers by their distance
+    geom_class = np.where(
+        fires_bufs_attrs_gdf['buf_dist'] == 0,
+        np.where(fires_bufs_attrs_gdf['GISAcres'].isna(), 'Reported Location', 'Perimeter'),
+        fires_bufs_attrs_gdf['buf_dist'].astype(str) + ' Mile Buffer'
+    )
 
-        fires_bufs_attrs_gdf.at[idx, 'DefaultLabel'] = f'{fire_number}-{fire_name}, {geom_class}'
+    fires_bufs_attrs_gdf['DefaultLabel'] = (
+        fires_bufs_attrs_gdf['AkFireNumber'].astype(str) + '-' + fires_bufs_attrs_gdf['IncidentName'].astype(str) + ', ' + geom_class
+    )
 
-    return fires_bufs_attrs_gdf
\ No newline at end of file
+    return fires_bufs_attrs_gdf
@@ -1,7 +1,9 @@
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 import geopandas as gpd
 import numpy as np
+import os
 import pandas as pd
 import pathlib
 import pickle as pkl
@@ -11,7 +13,11 @@ proj_root = pathlib.Path(__file__).parent.parent
 sys.path.append(proj_root)
 
 from utils.arcgis_helpers import AsyncArcGISRequester
-from utils.arcgis_helpers import arcgis_features_to_gdf, arcgis_polygon_features_to_gdf
+from utils.arcgis_helpers import arcgis_point_features_to_gdf, arcgis_polygon_features_to_gdf
+
+# summary of the wfigs cache, kept alongside the .pkl files so that cached features don't need to be unpickled
+# to know whether they have had a perimeter update
+WFIGS_CACHE_INDEX = '_wfigs_cache_index.parquet'
 
 async def get_wfigs_updates(akdof_var_service_url: str, wfigs_locations_url: str, wfigs_perimeters_url: str, token: str, testing: bool = False) -> tuple[dict]:
     '''
@@ -59,36 +65,34 @@ async def get_wfigs_updates(akdof_var_service_url: str, wfigs_locations_url: str
                     'onStatisticField': 'wfigs_ModifiedOnDateTime_dt',
                 }
             ]'''
-        }        
-        tmax_responses = await asyncio.gather(
-            *(requester.arcgis_rest_api_get(
-                base_url=f'{akdof_var_service_url}/{lyr_idx}',
-                params=max_timestamp_params,
-                operation='query?'
-            ) for lyr_idx in (0,1,2,3))
-        )
-        seconds = set()
-        for resp in tmax_responses:
-            sec = resp['features'][0]['attributes']['MAX_wfigs_ModifiedOnDateTime_dt'] / 1000
-            seconds.add(sec)
-        if len(seconds) > 1:
-            check_json_pickles = False
-        max_timestamp = datetime.fromtimestamp(min(seconds), timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
-        
+        }
         reprocess_errors_params = {
             'f': 'json',
             'where': "HasError = 1",
             'outfields': 'wfigs_IrwinID',
+            'returnDistinctValues': 'true',
             'returnGeometry': 'false',
             'token': token,
         }
-        err_responses = await asyncio.gather(
+        # max timestamp and error queries don't depend on each other, so all layers are queried for both in a single gather
+        layer_idxs = (0,1,2,3)
+        responses = await asyncio.gather(
             *(requester.arcgis_rest_api_get(
                 base_url=f'{akdof_var_service_url}/{lyr_idx}',
-                params=reprocess_errors_params,
+                params=params,
                 operation='query?'
-            ) for lyr_idx in (0,1,2,3))  
+            ) for params in (max_timestamp_params, reprocess_errors_params) for lyr_idx in layer_idxs)
         )
+        tmax_responses, err_responses = responses[:len(layer_idxs)], responses[len(layer_idxs):]
+
+        seconds = set()
+        for resp in tmax_responses:
+            sec = resp['features'][0]['attributes']['MAX_wfigs_ModifiedOnDateTime_dt'] / 1000
+            seconds.add(sec)
+        if len(seconds) > 1:
+            check_json_pickles = False
+        max_timestamp = datetime.fromtimestamp(min(seconds), timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+
         irwins_with_errors = set()
         for resp in err_responses:
             irwins = {feat['attributes']['wfigs_IrwinID'] for feat in resp['features']}
@@ -228,17 +232,62 @@ def prevent_perimeter_overwrite_by_point(wfigs_cache: str | pathlib.Path, wfigs_
     list[dict]
         WFIGS fire locations, minus any features that have previously had a perimeter update.
     '''
-    del_idx = set()
     wfigs_cache = pathlib.Path(wfigs_cache)
+    # the cache directory is listed once, rather than checking for a .pkl file for every feature
+    # (IrwinIDs are matched case-insensitively, as file paths are on Windows)
+    cached_files = _scan_wfigs_cache(wfigs_cache)
+    cache_index = _read_wfigs_cache_index(wfigs_cache)
+
+    # index entries are only trusted if the .pkl file has not been modified since the entry was written,
+    # any other cached features are unpickled (e.g. caches written before the index existed)
+    has_poly = {}
+    unindexed_idx = {}
     for idx, feat in enumerate(wfigs_point_features):
-        file_path = wfigs_cache / f'{feat['attributes']['IrwinID']}.pkl'
-        if file_path.exists():
-            with open(file_path, 'rb') as file:
-                old_feat = pkl.load(file)
-            if 'poly_PolygonDateTime' in old_feat['attributes']:
-                del_idx.add(idx)
-    return [feat for idx, feat in enumerate(wfigs_point_features) if idx not in del_idx]
+        key = feat['attributes']['IrwinID'].casefold()
+        if key not in cached_files:
+            continue
+        file_path, mtime_ns = cached_files[key]
+        index_entry = cache_index.get(key)
+        if index_entry is not None and index_entry[0] == mtime_ns:
+            has_poly[idx] = index_entry[1]
+        else:
+            unindexed_idx[idx] = file_path
+
+    # cache reads are disk-bound and independent of each other, so they run concurrently
+    if unindexed_idx:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            has_poly.update(zip(unindexed_idx, executor.map(_cached_feat_has_poly, unindexed_idx.values())))
+
+    return [feat for idx, feat in enumerate(wfigs_point_features) if not has_poly.get(idx, False)]
             
+def cache_wfigs_features(wfigs_cache: str | pathlib.Path, json_features: list[dict]) -> None:
+    '''
+    Saves the last seen json feature for each fire to the WFIGS cache, and updates the cache index.
+
+    Parameters
+    ----------
+    wfigs_cache : str | pathlib.Path
+        Location of cached .pkl files containing the last seen json feature for a fire.
+    json_features : list[dict]
+        WFIGS fire locations and/or perimeters that were successfully used to update the target service.
+    '''
+    wfigs_cache = pathlib.Path(wfigs_cache)
+    index_entries = {}
+    for feat in json_features:
+        try:
+            irwin = feat['attributes']['IrwinID']
+        except KeyError:
+            irwin = feat['attributes']['attr_IrwinID']
+        file_path = wfigs_cache / f'{irwin}.pkl'
+        with open(file_path, 'wb') as file:
+            pkl.dump(feat, file)
+        index_entries[irwin.casefold()] = (file_path.stat().st_mtime_ns, 'poly_PolygonDateTime' in feat['attributes'])
+
+    # the index is written after all .pkl files, an interrupted write leaves entries that fail the mtime check rather than wrong entries
+    cache_index = _read_wfigs_cache_index(wfigs_cache)
+    cache_index.update(index_entries)
+    _write_wfigs_cache_index(wfigs_cache, cache_index)
+
 def create_wfigs_fire_points_gdf(wfigs_points: dict) -> gpd.GeoDataFrame:
     '''
     Converts ArcGIS JSON features for WFIGS fire locations to a GeoDataFrame that is processed and formatted for analysis
@@ -250,11 +299,11 @@ def create_wfigs_fire_points_gdf(wfigs_points: dict) -> gpd.GeoDataFrame:
     Returns:
         - gpd.GeoDataFrame
     '''
-    wfigs_points_gdf = arcgis_features_to_gdf(wfigs_points)
-    wfigs_points_gdf['ReportedAcres'] = wfigs_points_gdf.apply(_assign_reported_acres, axis=1)
-    wfigs_points_gdf['FireActivityStatus'] = wfigs_points_gdf.apply(_assign_fire_activity_status, axis=1)
-    wfigs_points_gdf['AkFireRegion'] = wfigs_points_gdf.apply(_assign_ak_fire_region, axis=1)
-    wfigs_points_gdf['AkFireNumber'] = wfigs_points_gdf.apply(_assign_ak_fire_number, axis=1)
+    wfigs_points_gdf = arcgis_point_features_to_gdf(wfigs_points)
+    wfigs_points_gdf['ReportedAcres'] = _assign_reported_acres(wfigs_points_gdf)
+    wfigs_points_gdf['FireActivityStatus'] = _assign_fire_activity_status(wfigs_points_gdf)
+    wfigs_points_gdf['AkFireRegion'] = _assign_ak_fire_region(wfigs_points_gdf)
+    wfigs_points_gdf['AkFireNumber'] = _assign_ak_fire_number(wfigs_points_gdf)
     wfigs_points_ac_bufs_gdf = _create_reported_acres_buffers(wfigs_points_gdf)
     wfigs_points_ac_bufs_gdf[['MapMethod', 'GISAcres', 'PolygonDateTime']] = None
     wfigs_points_ac_bufs_gdf['ReportedAcOverPerimAc' ] = 0
@@ -273,29 +322,24 @@ def create_wfigs_fire_polys_gdf(wfigs_polys: dict) -> gpd.GeoDataFrame:
     '''
     wfigs_polys_gdf = arcgis_polygon_features_to_gdf(wfigs_polys)
 
-    wfigs_polys_gdf['ReportedAcres'] = wfigs_polys_gdf.apply(_assign_reported_acres, axis=1)
+    wfigs_polys_gdf['ReportedAcres'] = _assign_reported_acres(wfigs_polys_gdf, 'attr_')
     wfigs_polys_gdf['ReportedAcOverPerimAc'] = (wfigs_polys_gdf['ReportedAcres'] - wfigs_polys_gdf['poly_GISAcres']) >= 1
     # if poly_GISAcres or ReportedAcres is np.nan, we can get null values from the above comparison.
     wfigs_polys_gdf['ReportedAcOverPerimAc'] = wfigs_polys_gdf['ReportedAcOverPerimAc'].fillna(0)
 
-    wfigs_polys_gdf['FireActivityStatus'] = wfigs_polys_gdf.apply(_assign_fire_activity_status, axis=1)
-    wfigs_polys_gdf['AkFireRegion'] = wfigs_polys_gdf.apply(_assign_ak_fire_region, axis=1)
-    wfigs_polys_gdf['AkFireNumber'] = wfigs_polys_gdf.apply(_assign_ak_fire_number, axis=1)
+    wfigs_polys_gdf['FireActivityStatus'] = _assign_fire_activity_status(wfigs_polys_gdf, 'attr_')
+    wfigs_polys_gdf['AkFireRegion'] = _assign_ak_fire_region(wfigs_polys_gdf, 'attr_')
+    wfigs_polys_gdf['AkFireNumber'] = _assign_ak_fire_number(wfigs_polys_gdf, 'attr_')
 
     # It appears that event polygon updates in the NIFS do not trigger the WFIGS attr_ModifiedOnDateTime_dt attribute to update.
     # poly_DateCurrent represents information with equivalent meaning for our use case (the last moment in time a record for a fire was altered).
     # Introducing a second timestamp field to the target service would require refactoring code, updating schemas, complicating query logic, and so on.
     # For the time being (20250615) we see if we can instead achieve the desired functionality by
     # overwriting the polygons attr_ModifiedOnDateTime_dt attribute with any poly_DateCurrent attribute that is greater.
-    def _safe_max(attr_mod_dt: float, poly_curr_dt: float) -> float:
-        if pd.isna(poly_curr_dt):
-            return attr_mod_dt
-        if pd.isna(attr_mod_dt):
-            return poly_curr_dt
-        return max(attr_mod_dt, poly_curr_dt)
-    wfigs_polys_gdf["attr_ModifiedOnDateTime_dt"] = wfigs_polys_gdf.apply(
-        lambda x: _safe_max(x["attr_ModifiedOnDateTime_dt"], x["poly_DateCurrent"]),
-        axis=1
+    # (fmax() skips a null value in either field, so the other field is kept as is)
+    wfigs_polys_gdf["attr_ModifiedOnDateTime_dt"] = np.fmax(
+        wfigs_polys_gdf["attr_ModifiedOnDateTime_dt"].to_numpy(dtype='float64'),
+        wfigs_polys_gdf["poly_DateCurrent"].to_numpy(dtype='float64')
     )
 
     wfigs_polys_field_rename = {
@@ -338,109 +382,129 @@ def create_analysis_gdf(wfigs_points_ac_bufs_gdf: gpd.GeoDataFrame, wfigs_polys_
         'geometry'
     ]]
     
+    # distances for buffer creation & attribution
     # fire perimeters & reported size buffers will have 'buf_dist' of 0
     # 'buf_dist' will be used in a multi-index and later as a dictionary key, so this can't be None
-    new_fires_gdf['buf_dist'] = 0
-
-    # container for appending gdfs and then concatenating them
-    analysis_gdf_lst = [new_fires_gdf]
-
-    # distances for buffer creation & attribution
     buf_dist_meters = (1609.34, 4828.03, 8046.72)
-    buf_dist_miles = (1, 3, 5)
-
-    # create buffer geodataframe, append to analysis_gdf_lst for concatenation
-    for meters, miles in zip(buf_dist_meters, buf_dist_miles):
-        buf_gdf = gpd.GeoDataFrame(
-            {attrName : new_fires_gdf[attrName] for attrName
-            in new_fires_gdf.columns if attrName not in ('geometry', 'buf_dist')}
-        )
-        buf_gdf['buf_dist'] = miles
-        buf_gdf.set_geometry(new_fires_gdf['geometry'].buffer(meters), inplace=True, crs='EPSG:3338')
-        analysis_gdf_lst.append(buf_gdf)
-
-    # combine gdfs
-    analysis_gdf = pd.concat(analysis_gdf_lst, ignore_index=True, axis=0)
+    buf_dist_miles = (0, 1, 3, 5)
+
+    # buffer features differ from fire features only by geometry and 'buf_dist',
+    # so attributes for all buffer distances are repeated with a single take rather than copied and concatenated per distance
+    fire_count = len(new_fires_gdf)
+    analysis_gdf = new_fires_gdf.iloc[np.tile(np.arange(fire_count), len(buf_dist_miles))].reset_index(drop=True)
+    # 'buf_dist' only holds a handful of small values, so int8 is enough
+    analysis_gdf['buf_dist'] = np.repeat(np.array(buf_dist_miles, dtype=np.int8), fire_count)
+    analysis_gdf['geometry'] = gpd.GeoSeries(
+        np.concatenate([
+            new_fires_gdf['geometry'].to_numpy(),
+            *(new_fires_gdf['geometry'].buffer(meters).to_numpy() for meters in buf_dist_meters)
+        ]),
+        index=analysis_gdf.index,
+        crs='EPSG:3338'
+    )
 
     # create buf_dist & IrwinID multi-index
     analysis_gdf.set_index(keys=['buf_dist','IrwinID'], drop=False, inplace=True)
 
     return analysis_gdf
 
-def _assign_reported_acres(row: pd.Series) -> int:
+def _scan_wfigs_cache(wfigs_cache: pathlib.Path) -> dict[str, tuple[pathlib.Path, int]]:
+    '''
+    Returns {casefolded IrwinID : (.pkl file path, modified time in ns)} pairs for every feature in the WFIGS cache.
+    '''
+    try:
+        with os.scandir(wfigs_cache) as entries:
+            return {
+                entry.name[:-4].casefold(): (pathlib.Path(entry.path), entry.stat().st_mtime_ns)
+                for entry in entries if entry.name.endswith('.pkl')
+            }
+    except FileNotFoundError:
+        return {}
+
+def _read_wfigs_cache_index(wfigs_cache: pathlib.Path) -> dict[str, tuple[int, bool]]:
+    '''
+    Returns {casefolded IrwinID : (.pkl modified time in ns, has perimeter update)} pairs from the WFIGS cache index.
+    A missing or unreadable index is treated as empty, cached features are then checked individually
+    and the index is rebuilt the next time features are cached.
+    '''
+    try:
+        index_df = pd.read_parquet(wfigs_cache / WFIGS_CACHE_INDEX, columns=['IrwinID', 'mtime_ns', 'has_poly'])
+    except Exception:
+        return {}
+    return dict(zip(index_df['IrwinID'], zip(index_df['mtime_ns'].to_list(), index_df['has_poly'].to_list())))
+
+def _write_wfigs_cache_index(wfigs_cache: pathlib.Path, cache_index: dict[str, tuple[int, bool]]) -> None:
+    '''
+    Writes the WFIGS cache index, replacing the existing index file in a single step.
+    '''
+    index_df = pd.DataFrame(
+        [(irwin, mtime_ns, has_poly) for irwin, (mtime_ns, has_poly) in cache_index.items()],
+        columns=['IrwinID', 'mtime_ns', 'has_poly']
+    ).astype({'IrwinID': str, 'mtime_ns': 'int64', 'has_poly': bool})
+    index_path = wfigs_cache / WFIGS_CACHE_INDEX
+    tmp_path = index_path.with_suffix('.tmp')
+    index_df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, index_path)
+
+def _cached_feat_has_poly(file_path: pathlib.Path) -> bool:
+    '''
+    Checks whether a cached json feature has previously had a perimeter update.
+    '''
+    with open(file_path, 'rb') as file:
+        old_feat = pkl.load(file)
+    return 'poly_PolygonDateTime' in old_feat['attributes']
+
+def _assign_reported_acres(wfigs_gdf: gpd.GeoDataFrame, prefix: str = '') -> pd.Series:
     '''
-    This helper function is written to be used in a pandas.apply() function.
     It is critical that all WFIGS features have an acreage attribute.
     We preferentially takes an acreage attribute from columns in this order: 
     ['FinalAcres', 'IncidentSize', 'InitialResponseAcres', 'DiscoveryAcres'].
     If an acreage attribute is not found, 0.1 is automatically assigned.
+    Columns are prefixed with 'attr_' in WFIGS perimeters.
     '''
-    try:
-        for col in ['FinalAcres', 'IncidentSize', 'InitialResponseAcres', 'DiscoveryAcres']:
-            if pd.notna(row[col]):
-                return row[col]
-    except KeyError:
-        for col in ['attr_FinalAcres', 'attr_IncidentSize', 'attr_InitialResponseAcres', 'attr_DiscoveryAcres']:
-            if pd.notna(row[col]):
-                return row[col]
-    return 0.1
-
-def _assign_fire_activity_status(row: pd.Series) -> str:
+    acres_cols = [f'{prefix}{col}' for col in ('FinalAcres', 'IncidentSize', 'InitialResponseAcres', 'DiscoveryAcres')]
+    # back filling across the columns leaves the first non-null acreage of each row in the first column
+    return wfigs_gdf[acres_cols].bfill(axis=1).iloc[:, 0].fillna(0.1).astype(float)
+
+def _assign_fire_activity_status(wfigs_gdf: gpd.GeoDataFrame, prefix: str = '') -> np.ndarray:
     '''
-    This helper function is written to be used in a pandas.apply() function.
     Assigns FireActivityStatus based on presence of values in associated datetime fields.
     Preferentially takes values in order of ['FireOutDateTime', 'ControlDateTime', 'ContainmentDateTime']
     If no value is found, the fire is considered active.
+    Columns are prefixed with 'attr_' in WFIGS perimeters.
     '''
-    try:
-        for col,val in {
-            'FireOutDateTime': 'Out',
-            'ControlDateTime': 'Controlled',
-            'ContainmentDateTime': 'Contained'
-        }.items():
-            if pd.notna(row[col]):
-                return val
-    except KeyError:
-        for col,val in {
-            'attr_FireOutDateTime': 'Out',
-            'attr_ControlDateTime': 'Controlled',
-            'attr_ContainmentDateTime': 'Contained'
-        }.items():
-            if pd.notna(row[col]):
-                return val
-    return 'Active'
-
-def _assign_ak_fire_region(row: pd.Series) -> str:
+    status_by_col = {
+        'FireOutDateTime': 'Out',
+        'ControlDateTime': 'Controlled',
+        'ContainmentDateTime': 'Contained'
+    }
+    return np.select(
+        [wfigs_gdf[f'{prefix}{col}'].notna() for col in status_by_col],
+        list(status_by_col.values()),
+        default='Active'
+    )
+
+def _assign_ak_fire_region(wfigs_gdf: gpd.GeoDataFrame, prefix: str = '') -> pd.Series:
     '''
-    This helper function is written to be used in a pandas.apply() function.
     Parses the UniqueFireIdentifier attribute from either WFIGS locations or perimeters
     and returns the three-digit Alaska fire region ('MSS', for example).
+    Columns are prefixed with 'attr_' in WFIGS perimeters.
     '''
-    try:
-        unique_fire_id = row['UniqueFireIdentifier']
-    except KeyError:
-        unique_fire_id = row['attr_UniqueFireIdentifier']
-
-    id_parts = unique_fire_id.split('-')
-    full_region = id_parts[1]
-    ak_region = full_region.replace('AK','')
+    id_parts = wfigs_gdf[f'{prefix}UniqueFireIdentifier'].str.split('-')
+    full_region = id_parts.str[1]
+    ak_region = full_region.str.replace('AK', '', regex=False)
 
     return ak_region
     
-def _assign_ak_fire_number(row: pd.Series) -> int:
+def _assign_ak_fire_number(wfigs_gdf: gpd.GeoDataFrame, prefix: str = '') -> pd.Series:
     '''
-    This helper function is written to be used in a pandas.apply() function.
     Parses the UniqueFireIdentifier attribute from either WFIGS locations or perimeters
     and returns the three-digit Alaska fire number.
+    Columns are prefixed with 'attr_' in WFIGS perimeters.
     '''
-    try:
-        unique_fire_id = row['UniqueFireIdentifier']
-    except KeyError:
-        unique_fire_id = row['attr_UniqueFireIdentifier']
-
-    id_parts = unique_fire_id.split('-')
-    full_number = id_parts[2]
-    ak_number = full_number[-3:]
+    id_parts = wfigs_gdf[f'{prefix}UniqueFireIdentifier'].str.split('-')
+    full_number = id_parts.str[2]
+    ak_number = full_number.str[-3:]
 
     return ak_number
 
@@ -451,8 +515,5 @@ def _create_reported_acres_buffers(wfigs_points_gdf: gpd.GeoDataFrame) -> gpd.Ge
     '''
     wfigs_points_gdf['ReportedAcres_m2'] = wfigs_points_gdf['ReportedAcres'] * 4046.86
     wfigs_points_gdf['buf_radius'] = np.sqrt(wfigs_points_gdf['ReportedAcres_m2'] / np.pi)
-    wfigs_points_gdf['geometry'] = wfigs_points_gdf.apply(
-        lambda row: row['geometry'].buffer(row['buf_radius']),
-        axis=1
-    )
+    wfigs_points_gdf['geometry'] = wfigs_points_gdf['geometry'].buffer(wfigs_points_gdf['buf_radius'].to_numpy())
     return wfigs_points_gdf
\ No newline at end of file
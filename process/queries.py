@@ -1,14 +1,13 @@
 import asyncio
-from arcgis.geometry import Geometry
 from collections import defaultdict
-from copy import deepcopy
 import geopandas as gpd
-import json
 from multiprocessing import Pool
 import pandas as pd
 import pathlib
+import shapely as shp
 import sys
-from typing import NamedTuple
+from types import MappingProxyType
+import ujson
 
 proj_root = pathlib.Path(__file__).parent.parent
 sys.path.append(proj_root)
@@ -17,6 +16,23 @@ from utils.arcgis_helpers import AsyncArcGISRequester
 from utils.arcgis_helpers import arcgis_features_to_gdf, arcgis_polygon_features_to_gdf
 from utils.project import write_analysis_types_dict, batch_write_attr_tups
 
+# buffer distances (miles) that every fire is attributed for, 0 is the fire itself
+BUF_DISTS = (0, 1, 3, 5)
+
+# query template shared by every query bundle, 'geometry' is a placeholder for the envelope of each fire
+_CONSTANT_QUERY_PARAMS = MappingProxyType({
+    'f': 'json',
+    'geometry': None,
+    'geometryType': 'esriGeometryEnvelope',
+    'inSR': 3338,
+    'outSR': 3338,
+    'spatialRel': 'esriSpatialRelIntersects',
+    'returnGeometry': 'true',
+})
+
+# { var_alias : analysis_types } used by _handle_query_responses(), set in each pool worker by _init_query_response_worker()
+_ANALYSIS_TYPES_BY_ALIAS = None
+
 def gather_query_bundles(analysis_gdf: gpd.GeoDataFrame, query_plan: pd.DataFrame, token_dict: dict[str]) -> tuple[tuple]:
     '''
     Gather all query bundles, which will then be sent asynchronously.
@@ -34,122 +50,125 @@ def gather_query_bundles(analysis_gdf: gpd.GeoDataFrame, query_plan: pd.DataFram
     max_buf = analysis_gdf['buf_dist'].max()
     analysis_gdf_max_buf = analysis_gdf[analysis_gdf['buf_dist'] == max_buf]
 
-    # writing query bundles
-    query_bundles = tuple(
-        _write_query_bundle(
-            fire_max_buf=fire_max_buf,
-            url_alias=alias,
-            var_url=url,
-            var_params=params,
-            ago_org=ago_org,
-            token_dict=token_dict
-        ) 
-        for fire_max_buf in analysis_gdf_max_buf[['IrwinID','geometry']].itertuples(index=False)
+    # each fire's envelope is serialized once, then reused in the queries for every value-at-risk input
+    # envelopes are written as esri envelope json straight from shapely bounds
+    fire_envelopes = [
+        (irwin, ujson.dumps({'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax, 'spatialReference': {'wkid': 3338}}, escape_forward_slashes=False))
+        for irwin, (xmin, ymin, xmax, ymax) in zip(analysis_gdf_max_buf['IrwinID'], shp.bounds(analysis_gdf_max_buf.geometry.to_numpy()).tolist())
+    ]
+
+    # each value-at-risk input's query parameters are parsed once, then reused for every fire
+    query_templates = [
+        (alias, url, _write_query_params_template(params, ago_org, token_dict))
         for alias, url, params, ago_org in query_plan[['ALIAS','URL','QUERY_PARAMETERS','AGO_ORGANIZATION']].itertuples(index=False)
+    ]
+
+    # writing query bundles, formatted ( IrwinID, URL alias, URL, query parameters )
+    query_bundles = tuple(
+        (irwin, alias, url, {**params_template, 'geometry': envelope})
+        for irwin, envelope in fire_envelopes
+        for alias, url, params_template in query_templates
     )
 
     return query_bundles
 
-async def send_all_queries(query_bundles: tuple[tuple]) -> tuple[list, Exception | None]:
+async def send_and_handle_all_queries(query_bundles: tuple[tuple], analysis_plan: pd.DataFrame, batch_size: int) -> tuple[tuple[dict, list, dict], int, Exception | None]:
     '''
-    Asynchronously send all query bundles.
+    Asynchronously send all query bundles, handing query responses off to a pool of worker processes in batches as they complete.
+    Response handling overlaps with the queries still in flight, and the full list of query responses is never held in memory.
+    Workers look for patterns in query responses and handle each accordingly (see _handle_query_responses()).
+    Some responses will not require any analysis, and can generate attribution tuples right away.
+    Other responses will be prepared for subsequent analysis.
 
     Args:
         * query_bundles (tuple[tuple]) -- Tuple containing sub-tuples which are query bundles.
+        * analysis_plan (pd.DataFrame) -- Loaded from ..planning\\analysis_plan.tsv, determines which analyses to run and ultimately which attributes to create.
+        * batch_size (int) -- Number of query responses that will be handled by each _handle_query_responses() function call.
 
     Returns:
-        * tuple[list, Exception | None] -- List of query responses, Exception if requester instance exits early with Exception else None.
-    '''  
-    async with AsyncArcGISRequester() as requester:
-        query_responses = await asyncio.gather(
-            *(requester.send_query_bundle(*tup) for tup in query_bundles),
-            return_exceptions=True
-        )
+        * tuple[tuple[dict, list, dict], int, Exception | None] -- 
+            * tuple[dict, list, dict] -- 
+                * dict -- to hold { IrwinID : [(var_alias, geodataframe), ... } pairs for analysis.
+                * list -- to hold attribution tuples for response types that do not require any analysis.
+                * dict -- to hold { log_level : [message_1, message_2, ... ], ... } pairs that will later get logged from main
+            * int -- Number of query responses.
+            * Exception | None -- Exception if requester instance exits early with Exception else None.
+    '''
+    # analysis types are written once per var_alias, and sent to each worker once when the pool starts as plain python objects
+    analysis_types_by_alias = {var_alias: write_analysis_types_dict(analysis_plan, var_alias) for var_alias in analysis_plan['ALIAS'].unique()}
 
-    return (query_responses, requester.exception)
+    pending_results = []
+    response_count = 0
 
-def handle_query_response_pools(query_responses: list[tuple], analysis_plan: pd.DataFrame, batch_size: int) -> list[tuple]:
-    '''
-    Multiprocessing wrapper for _handle_query_responses().
-    Looks for patterns in query responses and handles each accordingly.
-    Some responses will not require any analysis, and can generate attribution tuples right away.
-    Other responses will be prepared for subsequent analysis.
+    # the pool is started before the requester opens its session, so workers are never forked from a process running request threads
+    with Pool(initializer=_init_query_response_worker, initargs=(analysis_types_by_alias,)) as p:
 
-    Args:
-        * query_responses (list[tuple]) -- Returned by send_all_queries().
-        * analysis_plan (pd.DataFrame) -- Loaded from ..planning\\analysis_plan.tsv, determines which analyses to run and ultimately which attributes to create.
-        * batch_size (int) -- Number of query responses that will be handled by each _handle_query_responses() function call.
+        async with AsyncArcGISRequester() as requester:
+            batch = []
+            for completed in asyncio.as_completed([requester.send_query_bundle(*tup) for tup in query_bundles]):
+                # send_query_bundle() passes exception details along in the expected tuple structure, so this should not be possible
+                # we check just in case, and reduce any Exception object to enable pickling during multiprocessing
+                try:
+                    batch.append(await completed)
+                except Exception as e:
+                    batch.append(e.__reduce__())
+                response_count += 1
 
-    Returns:
-        * tuple[dict, list, dict] -- 
-            * dict -- to hold { IrwinID : [(var_alias, geodataframe), ... } pairs for analysis.
-            * list -- to hold attribution tuples for response types that do not require any analysis.
-            * dict -- to hold { log_level : [message_1, message_2, ... ], ... } pairs that will later get logged from main
-    '''    
-    response_chunks = [tuple(query_responses[i: i + batch_size]) for i in range(0, len(query_responses), batch_size)]
+                if len(batch) >= batch_size:
+                    pending_results.append(p.apply_async(_handle_query_responses, (tuple(batch),)))
+                    batch = []
 
-    with Pool() as p:
-        results = p.starmap(
-            func=_handle_query_responses,
-            iterable=[(chunk, deepcopy(analysis_plan)) for chunk in response_chunks],
-            chunksize=1
-        )
+            if batch:
+                pending_results.append(p.apply_async(_handle_query_responses, (tuple(batch),)))
 
-    query_features_dict, results_no_analysis, logger_dict = _merge_pool_results(results)
+        # all queries are complete, so waiting on workers does not hold up any requests
+        merged_results = (defaultdict(list), [], defaultdict(list))
+        for pending in pending_results:
+            _merge_pool_result(merged_results, pending.get())
 
-    return (query_features_dict, results_no_analysis, logger_dict)
+    query_features_dict, results_no_analysis, logger_dict = merged_results
+
+    return ((dict(query_features_dict), results_no_analysis, dict(logger_dict)), response_count, requester.exception)
 
-def _merge_pool_results(results: list[tuple]) -> tuple:
+def _init_query_response_worker(analysis_types_by_alias: dict[str, dict]) -> None:
     '''
-    Combines many tuples returned by _handle_query_responses() into a single tuple of identical structure.
+    Pool initializer, stores { var_alias : analysis_types } pairs in each worker process for use by _handle_query_responses().
+    '''
+    global _ANALYSIS_TYPES_BY_ALIAS
+    _ANALYSIS_TYPES_BY_ALIAS = analysis_types_by_alias
+
+def _merge_pool_result(merged_results: tuple, result: tuple) -> None:
+    '''
+    Merges a tuple returned by _handle_query_responses() into a tuple of identical structure, in place.
     
     Args:
-        * results (list[tuple]) -- contains tuples structured ( query_features_dict , results_no_analysis , logger_dict )
+        * merged_results (tuple) -- structured ( query_features_dict , results_no_analysis , logger_dict ), with defaultdict(list) dictionaries
+        * result (tuple) -- structured ( query_features_dict , results_no_analysis , logger_dict )
             * see _handle_query_responses() for descriptions of these objects
-
-    Returns:
-        * tuple[dict, list, dict] -- 
-            * dict -- to hold { IrwinID : [(var_alias, geodataframe), ... } pairs for analysis.
-            * list -- to hold attribution tuples for response types that do not require any analysis.
-            * dict -- to hold { log_level : [message_1, message_2, ... ], ... } pairs that will later get logged from main
-
     '''
-    # create list of all query_features_dict objects 
-    chunked_query_features_dicts = [tup[0] for tup in results]
-
-    # define template for the completed query_features_dict object
-    query_features_dict = {irwin: [] for obj in chunked_query_features_dicts for irwin,_ in obj.items()}
+    query_features_dict, results_no_analysis, logger_dict = merged_results
+    chunk_query_features_dict, chunk_results_no_analysis, chunk_logger_dict = result
 
     # add all (var_alias, geodataframe) pairs to lists associated with respective IrwinIDs
-    for obj in chunked_query_features_dicts:
-        for irwin, analysis_pairs in obj.items():
-            query_features_dict[irwin].extend(analysis_pairs)
-
-    # unpack attribute tuples from all results_no_analysis lists into a single list
-    results_no_analysis = [item for tup in results for item in tup[1]]
-
-    # create list of all logger_dict objects 
-    chunked_logger_dicts = [tup[2] for tup in results]
+    for irwin, analysis_pairs in chunk_query_features_dict.items():
+        query_features_dict[irwin].extend(analysis_pairs)
 
-    # define template for the completed logger_dict object
-    logger_dict = {log_level: [] for obj in chunked_logger_dicts for log_level,_ in obj.items()}
+    # unpack attribute tuples into a single list
+    results_no_analysis.extend(chunk_results_no_analysis)
 
     # add all log messages to lists associated with respective logging level
-    for obj in chunked_logger_dicts:
-        for log_level, messages in obj.items():
-            logger_dict[log_level].extend(messages)
+    for log_level, messages in chunk_logger_dict.items():
+        logger_dict[log_level].extend(messages)
 
-    return (query_features_dict, results_no_analysis, logger_dict)
-
-def _handle_query_responses(query_responses: tuple[tuple], analysis_plan: pd.DataFrame) -> tuple[dict, list]:
+def _handle_query_responses(query_responses: tuple[tuple]) -> tuple[dict, list]:
     '''
     Looks for patterns in query responses and handles each accordingly.
     Some responses will not require any analysis, and can generate attribution tuples right away.
     Other responses will be prepared for subsequent analysis.
+    Runs in pool workers started by send_and_handle_all_queries(), which hold analysis types for every var_alias.
 
     Args:
-        * query_responses (list[tuple]) -- returned by send_all_queries().
-        * analysis_plan (pd.DataFrame) -- Loaded from ..planning\\analysis_plan.tsv, determines which analyeses to run and ultimately which attributes to create.
+        * query_responses (tuple[tuple]) -- returned by send_query_bundle() for each query bundle.
 
     Returns:
         * tuple[dict, list, dict] -- 
@@ -182,47 +201,34 @@ def _handle_query_responses(query_responses: tuple[tuple], analysis_plan: pd.Dat
         identifier, var_alias, data = response
 
         # this determines which attributes get written by batch writes
-        analysis_types = write_analysis_types_dict(analysis_plan, var_alias)
+        analysis_types = _ANALYSIS_TYPES_BY_ALIAS[var_alias]
 
         if isinstance(data, tuple) and isinstance(data[0], type):
             if issubclass(data[0], Exception):
-                logger_dict['error'].append(json.dumps(
+                logger_dict['error'].append(ujson.dumps(
                     {
                         'identifier': identifier,
                         'var_alias': var_alias,
                         'exception_info': str(data)
-                    }
+                    },
+                    escape_forward_slashes=False
                 ))
-                for buf_dist in (0,1,3,5):
-                    attr_tups = batch_write_attr_tups(identifier, buf_dist, var_alias, analysis_types, '!EXCEPTION!')
-                    if 'NEAREST_FEATS_FIELDS' in analysis_types and buf_dist == 5:
-                        attr_tups.append((identifier, 0, f'{var_alias}_nearest_feats', '!EXCEPTION!'))
-                        attr_tups.append((identifier, 0, f'{var_alias}_interior_feats', '!EXCEPTION!'))
-                    results_no_analysis.append(attr_tups)
+                results_no_analysis.append(_write_no_analysis_attr_tups(identifier, var_alias, analysis_types, '!EXCEPTION!'))
 
         elif 'error' in data and len(data) == 1:
-            logger_dict['error'].append(json.dumps(
+            logger_dict['error'].append(ujson.dumps(
                 {
                     'identifier': identifier,
                     'var_alias': var_alias,
                     'query_error_info': data
-                }
+                },
+                escape_forward_slashes=False
             ))
-            for buf_dist in (0,1,3,5):
-                attr_tups = batch_write_attr_tups(identifier, buf_dist, var_alias, analysis_types, '!QUERYERROR!')
-                if 'NEAREST_FEATS_FIELDS' in analysis_types and buf_dist == 5:
-                    attr_tups.append((identifier, 0, f'{var_alias}_nearest_feats', '!QUERYERROR!'))
-                    attr_tups.append((identifier, 0, f'{var_alias}_interior_feats', '!QUERYERROR!'))
-                results_no_analysis.append(attr_tups)
+            results_no_analysis.append(_write_no_analysis_attr_tups(identifier, var_alias, analysis_types, '!QUERYERROR!'))
 
         elif 'features' in data:
             if len(data['features']) < 1:
-                for buf_dist in (0,1,3,5):
-                    attr_tups = batch_write_attr_tups(identifier, buf_dist, var_alias, analysis_types, None)
-                    if 'NEAREST_FEATS_FIELDS' in analysis_types and buf_dist == 5:
-                        attr_tups.append((identifier, 0, f'{var_alias}_nearest_feats', None))
-                        attr_tups.append((identifier, 0, f'{var_alias}_interior_feats', None))
-                    results_no_analysis.append(attr_tups)
+                results_no_analysis.append(_write_no_analysis_attr_tups(identifier, var_alias, analysis_types, None))
 
             else:
                 sample_feature = data['features'][0]
@@ -239,69 +245,60 @@ def _handle_query_responses(query_responses: tuple[tuple], analysis_plan: pd.Dat
                 #* could perform key check for 'attributes' and write to pandas df, if needed at some point
         
         else:
-            logger_dict['error'].append(json.dumps(
+            logger_dict['error'].append(ujson.dumps(
                 {
                     'identifier': identifier,
                     'var_alias': var_alias,
                     'unexpected_query_response': True
-                }
+                },
+                escape_forward_slashes=False
             ))
-            for buf_dist in (0,1,3,5):
-                attr_tups = batch_write_attr_tups(identifier, buf_dist, var_alias, analysis_types, '!UNEXPECTED!')
-                if 'NEAREST_FEATS_FIELDS' in analysis_types and buf_dist == 5:
-                    attr_tups.append((identifier, 0, f'{var_alias}_nearest_feats', '!UNEXPECTED!'))
-                    attr_tups.append((identifier, 0, f'{var_alias}_interior_feats', '!UNEXPECTED!'))
-                results_no_analysis.append(attr_tups)
+            results_no_analysis.append(_write_no_analysis_attr_tups(identifier, var_alias, analysis_types, '!UNEXPECTED!'))
 
     return (query_features_dict, results_no_analysis, logger_dict)
 
-def _write_query_bundle(
-    fire_max_buf: NamedTuple,
-    url_alias: str,
-    var_url: str,
-    var_params: dict,
-    ago_org: str,
-    token_dict: dict
-    ) -> tuple: 
+def _write_no_analysis_attr_tups(identifier: str, var_alias: str, analysis_types: dict, value: str | None) -> list[tuple]:
     '''
-    Writes a single query bundle that will be gathered and sent asynchronously.
+    Writes all attribution tuples for a fire and a value-at-risk input whose query response does not require any analysis,
+    giving each attribute the same value.
 
     Args:
-        * fire_max_buf (NamedTuple) -- (IrwinID, geometry) for maximum buffer created for a given fire.
-        * url_alias (str) -- Short string identifier for URL, used in tracking query responses.
-        * var_url (str) --  URL to be queried.
-        * var_params (dict) -- Query parameters specific to the URL to be queried.
+        * identifier (str) -- IrwinID of the fire.
+        * var_alias (str) -- Alias for the value-at-risk input.
+        * analysis_types (dict) -- Determines which attributes get written.
+        * value (str | None) -- Sentinel string identifying the response type, or None if the response held no features.
+
+    Returns:
+        * list[tuple] -- Attribution tuples formatted (IrwinID, buf_dist, attrName, attrVal), for every buffer distance.
+    '''
+    attr_tups = []
+    for buf_dist in BUF_DISTS:
+        attr_tups.extend(batch_write_attr_tups(identifier, buf_dist, var_alias, analysis_types, value))
+
+    # nearest & interior features are only attributed to the fire itself
+    if 'NEAREST_FEATS_FIELDS' in analysis_types:
+        attr_tups.append((identifier, 0, f'{var_alias}_nearest_feats', value))
+        attr_tups.append((identifier, 0, f'{var_alias}_interior_feats', value))
+
+    return attr_tups
+
+def _write_query_params_template(var_params: str, ago_org: str, token_dict: dict) -> dict:
+    '''
+    Writes the query parameters for a value-at-risk input, which are shared by the query bundles for every fire.
+    The 'geometry' parameter is a placeholder, to be replaced by the envelope of each fire.
+
+    Args:
+        * var_params (str) -- JSON query parameters specific to the URL to be queried.
         * ago_org (str) -- Organization requiring authentication for query.
         * token_dict (dict) -- For retrieving tokens to use in queries. Formatted { ago_org : token }
 
     Returns:
-        * tuple -- formatted ( IrwinID, URL alias, URL, query parameters )
-    '''  
-
-    # to be used for tracking responses
-    irwin = fire_max_buf.IrwinID
-    # to be used for spatial query
-    fire_max_buf_geom = fire_max_buf.geometry
-
-    # get envelope for spatial query
-    #! there should be a more efficient way to get my bbox geometry from shapely directly
-    envelope = Geometry.from_shapely(fire_max_buf_geom, {'wkid': 3338}).envelope
-
-    # query template
-    constant_params = {
-        'f': 'json',
-        'geometry': json.dumps(envelope),
-        'geometryType': 'esriGeometryEnvelope',
-        'inSR': 3338,
-        'outSR': 3338,
-        'spatialRel': 'esriSpatialRelIntersects',
-        'returnGeometry': 'true',
-    }
-
+        * dict -- query parameters, minus the envelope for the spatial query
+    '''
     # modify query template using url-specific parameters
-    var_params = json.loads(var_params)
-    var_params.update(constant_params)
+    var_params = ujson.loads(var_params)
+    var_params.update(_CONSTANT_QUERY_PARAMS)
     if not pd.isna(ago_org):
         var_params['token'] = token_dict[ago_org]
 
-    return (irwin, url_alias, var_url, var_params)
\ No newline at end of file
+    return var_params
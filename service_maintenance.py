@@ -2,7 +2,6 @@ import asyncio
 from datetime import datetime, timedelta, timezone
 import geopandas as gpd
 import json
-import os
 import numpy as np
 import pandas as pd
 import pathlib
@@ -10,10 +9,9 @@ import pickle as pkl
 import pytz
 import sys
 import traceback
-import time
 
 from utils.arcgis_helpers import AsyncArcGISRequester, checkout_token
-from utils.general import basic_file_logger, format_logged_exception, send_email
+from utils.general import basic_file_logger, format_logged_exception, send_email, get_send_email_params
 from process.output import find_apply_edits_failure, find_apply_edits_success
 
 async def archive_dof_var_service(perims_locs_url: str, token: str) -> tuple[gpd.GeoDataFrame | None, list | None, Exception | None] | None:
@@ -111,22 +109,30 @@ async def purge_features_gone_from_wfigs(perims_locs_url: str, wfigs_locs_url: s
 
         # Because excessively long request parameters can result in http 404 responses,
         # we make irwin id queries in batches of twenty.
-        # This is not being done efficiently, but for the task at hand, effiency is not a factor.
         ak_wf_var_irwins_chunks = list(ak_wf_var_irwins)
         ak_wf_var_irwins_chunks = [tuple(ak_wf_var_irwins_chunks[i: i + 20]) for i in range(0, len(ak_wf_var_irwins), 20)]
 
+        # chunks are queried concurrently, with only a few queries in flight at once to go easy on WFIGS
+        wfigs_query_slots = asyncio.Semaphore(4)
+
+        async def query_wfigs_irwins(irwins_chunk: tuple) -> dict:
+            async with wfigs_query_slots:
+                return await requester.arcgis_rest_api_get(
+                    base_url=wfigs_locs_url,
+                    params={'f':'json', 'token':token, 'outfields':'IrwinID', 'where':f"IrwinID IN ({','.join(f"'{irwin}'" for irwin in irwins_chunk)})", 'returnGeometry':'false'},
+                    operation='query?'
+                )
+
+        all_current_wfigs_feats = await asyncio.gather(
+            *(query_wfigs_irwins(irwins_chunk) for irwins_chunk in ak_wf_var_irwins_chunks)
+        )
+
         current_wfigs_irwins = set()
-        for irwins_chunk in ak_wf_var_irwins_chunks:
-            current_wfigs_feats = await requester.arcgis_rest_api_get(
-                base_url=wfigs_locs_url,
-                params={'f':'json', 'token':token, 'outfields':'IrwinID', 'where':f"IrwinID IN ({','.join(f"'{irwin}'" for irwin in irwins_chunk)})", 'returnGeometry':'false'},
-                operation='query?'
-            )
+        for current_wfigs_feats in all_current_wfigs_feats:
             try:
                 current_wfigs_irwins.update([feat['attributes']['IrwinID'] for feat in current_wfigs_feats['features']])
             except KeyError:
                 raise KeyError(f'Expected keys not found in query response: {current_wfigs_feats}')
-            time.sleep(5)
         
         ak_wf_var_irwins.difference_update(current_wfigs_irwins)
 
@@ -159,12 +165,12 @@ def main():
     # there is targeted exception handling at lower levels
     try:
 
-        sender, recipient, password = os.getenv('SEND_EMAIL_PARAMS').split(',')
+        sender, recipient, password = get_send_email_params()
 
         logger = basic_file_logger('service_maintenance_info.log')
         logger.info('STARTING PROCESS')
 
-        proj_dir = pathlib.Path().cwd()
+        proj_dir = pathlib.Path.cwd()
         archive_dir = proj_dir / 'out_fires_archive'
         input_json_dir = proj_dir / 'docs' / 'input_json'
 
@@ -191,8 +197,8 @@ def main():
             log_gdf = archive_gdf[['AkFireNumber','wfigs_IncidentName','wfigs_IrwinID']].drop_duplicates()
             logger.info('Features for the following incidents were removed from the AK WF VAR service to be archived-->')
             logger.info(f'({len(log_gdf)} unique fire(s), {len(archive_gdf)} total features)')
-            for _, row in log_gdf.iterrows():
-                logger.info(json.dumps(row.to_dict()))
+            for row in log_gdf.to_dict('records'):
+                logger.info(json.dumps(row))
 
             # Because the service schema will change over time,
             # the archive of 'Out' fires will be built as a directory of timestamped geodataframe pickles.
@@ -264,9 +270,7 @@ def main():
                 purged_df.sort_values('AkFireNumber', ascending=False, inplace=True, key=lambda col: col.astype(int))
                 purged_df = purged_df.replace({np.nan: None})
 
-                tabulator_rows = []
-                for _,row in purged_df.iterrows():
-                    tabulator_rows.append(row.to_dict())
+                tabulator_rows = purged_df.to_dict('records')
                 with open(input_json_dir / f'{name}.json', 'w') as file:
                     json.dump(tabulator_rows, file, indent=4)
                 logger.info(f'{len(current_df) - len(purged_df)} rows removed from {name} table.')
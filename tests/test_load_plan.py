@@ -0,0 +1,35 @@
+import pathlib
+import shutil
+import sys
+import tempfile
+import unittest
+
+proj_root = pathlib.Path(__file__).parent.parent
+sys.path.append(str(proj_root))
+
+from utils.project import load_plan
+
+class TestLoadPlan(unittest.TestCase):
+    '''
+    The pickled plan cache is only an optimization, a damaged cache must fall back to the plan file.
+    '''
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.plan_path = pathlib.Path(shutil.copy(proj_root / 'planning' / 'query_plan.tsv', self._tmp_dir.name))
+        self.cache_path = self.plan_path.with_suffix('.pkl')
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def test_truncated_cache_is_rebuilt(self):
+        plan = load_plan(self.plan_path)
+        self.cache_path.write_bytes(self.cache_path.read_bytes()[:10])
+
+        self.assertTrue(load_plan(self.plan_path).equals(plan))
+        # the rebuilt cache is readable and no temporary file is left behind
+        self.assertTrue(load_plan(self.plan_path).equals(plan))
+        self.assertEqual(sorted(path.name for path in self.plan_path.parent.iterdir()), ['query_plan.pkl', 'query_plan.tsv'])
+
+if __name__ == '__main__':
+    unittest.main()
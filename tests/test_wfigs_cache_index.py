@@ -0,0 +1,48 @@
+import pandas as pd
+import pathlib
+import sys
+import tempfile
+import unittest
+
+proj_root = pathlib.Path(__file__).parent.parent
+sys.path.append(str(proj_root))
+
+from process.prepare_wfigs_inputs import WFIGS_CACHE_INDEX, cache_wfigs_features, prevent_perimeter_overwrite_by_point
+
+class TestWfigsCacheIndex(unittest.TestCase):
+    '''
+    The WFIGS cache index is only an optimization, a damaged index file must not stop the pipeline.
+    '''
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.wfigs_cache = pathlib.Path(self._tmp_dir.name)
+        self.poly_feat = {'attributes': {'attr_IrwinID': '{ABC-1}', 'poly_PolygonDateTime': 1}}
+        self.point_feats = [{'attributes': {'IrwinID': '{abc-1}'}}, {'attributes': {'IrwinID': '{abc-2}'}}]
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _corrupt_index(self):
+        (self.wfigs_cache / WFIGS_CACHE_INDEX).write_bytes(b'not a parquet file')
+
+    def test_prevent_overwrite_with_corrupt_index(self):
+        cache_wfigs_features(self.wfigs_cache, [self.poly_feat])
+        self._corrupt_index()
+
+        remaining = prevent_perimeter_overwrite_by_point(self.wfigs_cache, self.point_feats)
+
+        self.assertEqual(remaining, self.point_feats[1:])
+
+    def test_cache_features_rebuilds_corrupt_index(self):
+        self._corrupt_index()
+
+        cache_wfigs_features(self.wfigs_cache, [self.poly_feat])
+
+        index_df = pd.read_parquet(self.wfigs_cache / WFIGS_CACHE_INDEX)
+        self.assertEqual(index_df['IrwinID'].to_list(), ['{abc-1}'])
+        self.assertTrue(index_df['has_poly'].iloc[0])
+        self.assertEqual(prevent_perimeter_overwrite_by_point(self.wfigs_cache, self.point_feats), self.point_feats[1:])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,7 @@ from copy import deepcopy
 import geopandas as gpd
 import json
 from multidict import CIMultiDictProxy
+import numpy as np
 import os
 import pandas as pd
 from pathlib import Path
@@ -15,6 +16,7 @@ import subprocess
 import time
 from typing import Iterable
 import traceback
+import ujson
 
 class RequesterException(Exception):
     '''Implemented so that aiohttp raise_for_status() exception details are pickle-able'''
@@ -80,7 +82,7 @@ class AsyncArcGISRequester():
         async with self.session.get(url, params=params) as response:
             try:
                 response.raise_for_status()
-                return await response.read() if is_raw else await response.json()
+                return await response.read() if is_raw else await response.json(loads=ujson.loads)
             except aiohttp.ClientResponseError as e:
                 raise RequesterException(
                     status=e.status,
@@ -95,7 +97,7 @@ class AsyncArcGISRequester():
         async with self.session.post(url, data=data) as response:
             try:
                 response.raise_for_status()
-                return await response.read() if is_raw else await response.json()
+                return await response.read() if is_raw else await response.json(loads=ujson.loads)
             except aiohttp.ClientResponseError as e:
                 raise RequesterException(
                     status=e.status,
@@ -262,10 +264,11 @@ class AsyncArcGISRequester():
             'where': get_oids_to_delete_query
         }
 
-        get_oids_response = await self.arcgis_rest_api_get(
+        # the where clause can list every IrwinID with an update, so it is sent in the request body rather than the url
+        get_oids_response = await self.arcgis_rest_api_post(
             base_url=url,
-            params=get_oids_params,
-            operation='query?'
+            data=get_oids_params,
+            operation='query'
             )
         
         try:
@@ -273,8 +276,9 @@ class AsyncArcGISRequester():
         except KeyError:
             raise KeyError(f'Key "objectIds" not found in query response: {get_oids_response}')
 
+        # adds can hold every feature for a layer, so it is serialized with ujson
         apply_edits_data = {
-            'adds': json.dumps(features_to_add),
+            'adds': ujson.dumps(features_to_add, escape_forward_slashes=False),
             'deletes': json.dumps(oids),
             'rollbackOnFailure': 'true',
             'f': 'json',
@@ -443,6 +447,23 @@ def arcgis_features_to_dataframe(features: dict) -> pd.DataFrame:
 
     return pd.DataFrame(df_dict)
 
+def arcgis_point_features_to_gdf(point_features: dict) -> gpd.GeoDataFrame:
+    '''
+    Converts ArcGIS JSON point features to a GeoDataFrame, building point geometries directly from their x/y coordinates
+    rather than converting to an ArcGIS FeatureSet and then to GeoJSON. Features without a geometry get a None geometry.
+    '''
+    features = point_features['features']
+    attrs_df = pd.DataFrame.from_records([feat['attributes'] for feat in features])
+
+    xy = np.array(
+        [(geom['x'], geom['y']) if geom else (np.nan, np.nan) for geom in (feat.get('geometry') for feat in features)],
+        dtype=float
+    ).reshape(-1, 2)
+    points = shp.points(xy)
+    points[np.isnan(xy).any(axis=1)] = None
+
+    return gpd.GeoDataFrame(attrs_df, geometry=points, crs='EPSG:3338')
+
 def arcgis_polygon_features_to_gdf(polygon_features: dict) -> gpd.GeoDataFrame:
     '''
     Converts ArcGIS JSON polygon features to a GeoDataFrame, first applying a cleanup function
@@ -457,6 +478,43 @@ def arcgis_polygon_features_to_gdf(polygon_features: dict) -> gpd.GeoDataFrame:
 
     return polys_gdf
 
+def gdf_to_arcgis_polygon_features(gdf: gpd.GeoDataFrame, wkid: int = 3338) -> list[dict]:
+    '''
+    Converts a GeoDataFrame of polygon features directly to ArcGIS JSON features,
+    without the GeoDataFrame -> GeoJSON -> ArcGIS JSON round trip.
+    Rings are written in ArcGIS order (exterior rings clockwise, interior rings counter-clockwise).
+    This does NOT reproject the geometries, wkid only labels the spatialReference of each feature!
+
+    Args:
+        - gdf (gpd.GeoDataFrame) -- Polygon / MultiPolygon features.
+        - wkid (int) -- Well-known ID of the projection the geometries are in. Defaults to 3338.
+
+    Returns:
+        - list[dict] -- ArcGIS JSON features.
+    '''
+    # missing attribute values become None, and numpy / pandas scalars become python objects, so features are JSON serializable
+    attrs_df = gdf.drop(columns=gdf.geometry.name).astype(object)
+    all_attrs = attrs_df.where(attrs_df.notna(), None).to_dict('records')
+
+    features = []
+    for attrs, geom in zip(all_attrs, gdf.geometry.values):
+
+        # a multipolygon is written as the rings of all its parts
+        rings = []
+        parts = getattr(geom, 'geoms', [geom]) if geom is not None else []
+        for part in parts:
+            if part.is_empty:
+                continue
+            part = shp.geometry.polygon.orient(part, sign=-1.0)
+            rings.extend(shp.get_coordinates(ring).tolist() for ring in (part.exterior, *part.interiors))
+
+        features.append({
+            'geometry': {'rings': rings, 'spatialReference': {'wkid': wkid}},
+            'attributes': attrs
+        })
+
+    return features
+
 def checkout_token(credentials_env_var: str, token_minutes: int, token_env_var: str, minutes_needed: int):
     '''
     Written for accessing token to use with the ArcGIS REST API. Checks out an existing token saved to
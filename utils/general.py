@@ -1,13 +1,19 @@
+import atexit
 from datetime import datetime
 from email.mime.text import MIMEText
+import functools
 import logging
+import logging.handlers
+import os
 import pandas as pd
 from pathlib import Path
 import pytz
+import queue
 import re
 import smtplib
 import traceback
 from typing import Iterable
+import ujson
 from types import TracebackType
 
 def basic_file_logger(file_path: str | Path, log_level: str = 'INFO') -> logging.Logger:
@@ -17,6 +23,7 @@ def basic_file_logger(file_path: str | Path, log_level: str = 'INFO') -> logging
     * Logger is given name = __name__.
     * If logger with name = __name__ already has handlers, it will be returned as-is.
     * Intended for use-cases in which the main process only has need for a single log file and file handler configuration.
+    * Records are written to the file from a background QueueListener thread, which is flushed and stopped at interpreter exit.
 
     Args:
         * file_path (str) -- Path to the log file. Any valid string path or Path object is accepted.
@@ -46,10 +53,34 @@ def basic_file_logger(file_path: str | Path, log_level: str = 'INFO') -> logging
         formatter = logging.Formatter(r'%(asctime)s|%(levelname)s|%(module)s|%(lineno)d|%(message)s')
         file_handler.setFormatter(formatter)
 
-        logger.addHandler(file_handler)
+        # records are handed off to a queue and written to the file by a listener thread,
+        # so logging calls do not block on file writes
+        # the listener is stopped at interpreter exit, which flushes any queued records
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.setLevel(level)
+
+        listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+
+        logger.addHandler(queue_handler)
 
     return logger
 
+class LazyJSON():
+    '''
+    Wraps a JSON serializable object so that it is only serialized (using ujson) if a logging record is actually emitted.
+    Pass an instance directly as the message of a logging call, i.e. logger.info(LazyJSON({...})).
+    '''
+    __slots__ = ('obj',)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        return ujson.dumps(self.obj, escape_forward_slashes=False)
+
 def format_logged_exception(exc_type: type[BaseException], exc_val: BaseException, exc_tb: TracebackType, max_chars: int = 2000) -> str:
     '''
     * Formats standard exception information made available by context manager __exit__ or __aexit__ calls, or inside of an Except block.
@@ -91,6 +122,25 @@ def archive_log(file_path: str | Path, archive_dir_path: str | Path) -> None:
     date = datetime.now().strftime('%Y_%m_%d')
     source.rename(dest / f'{source.stem}_{date}.log')
 
+def count_file_lines(file_path: str | Path, chunk_size: int = 1 << 20) -> int:
+    '''
+    Counts newline characters in a file by reading it in binary chunks.
+    Much faster than iterating over a text file line by line, since newline searching happens in C instead of Python.
+
+    Args:
+        file_path (str | Path): Path to the file. Any valid string path or Path object is accepted.
+        chunk_size (int, optional): Number of bytes read per chunk. Defaults to 1 MiB.
+
+    Returns:
+        int: Number of lines in the file.
+    '''
+    lines = 0
+    # unbuffered binary file, each read() is a single chunk_size read syscall with no intermediate buffer copy
+    with open(file_path, 'rb', buffering=0) as file:
+        while chunk := file.read(chunk_size):
+            lines += chunk.count(b'\n')
+    return lines
+
 def write_log_check_email_body(file_path: str | Path, previous_hours: int,  check_level: str = 'WARNING') -> str | None:
     '''
     Reads a log file and writes a simple text body that is intended to be sent in automated emails.
@@ -146,13 +196,47 @@ def send_email(subject: str, body: str, sender: str, recipients: str | Iterable[
         recipients (str | Iterable[str]): Email address or addresses of recipient or recipients.
         password (str): App password to access sender email account programmatically. 
     '''
-    msg = MIMEText(body)
-    msg['Subject'] = subject
-    msg['From'] = sender
-    msg['To'] = recipients if isinstance(recipients, str) else ', '.join(recipients)
+    send_emails([(subject, body)], sender, recipients, password)
+
+def send_emails(messages: Iterable[tuple[str, str]], sender: str, recipients: str | Iterable[str], password: str) -> None:
+    '''
+    Sends multiple emails using a single SMTP session, so the connection, TLS handshake, and login only happen once.
+    This function was written for use with a gmail sender account. With gmail you must enable 2fa to generate an app password for programmatic use.
+
+    Args:
+        messages (Iterable[tuple[str, str]]): Contains ( subject , body ) pairs, one for each email.
+        sender (str): Email address of sender.
+        recipients (str | Iterable[str]): Email address or addresses of recipient or recipients.
+        password (str): App password to access sender email account programmatically. 
+    '''
+    messages = list(messages)
+    if not messages:
+        return
+
+    recipients = recipients if isinstance(recipients, str) else list(recipients)
     with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp_server:
         smtp_server.login(sender, password)
-        smtp_server.sendmail(sender, recipients, msg.as_string())
+        for subject, body in messages:
+            msg = MIMEText(body)
+            msg['Subject'] = subject
+            msg['From'] = sender
+            msg['To'] = recipients if isinstance(recipients, str) else ', '.join(recipients)
+            smtp_server.sendmail(sender, recipients, msg.as_string())
+
+@functools.lru_cache(maxsize=1)
+def get_send_email_params() -> tuple[str, str, str]:
+    '''
+    Parses the SEND_EMAIL_PARAMS environment variable once per process and caches the result.
+    The environment variable must hold a comma seperated string like '{sender},{recipient},{password}'.
+
+    Raises:
+        KeyError: Environment variable "SEND_EMAIL_PARAMS" is not set.
+
+    Returns:
+        tuple[str, str, str]: ( sender , recipient , password )
+    '''
+    sender, recipient, password = os.environ['SEND_EMAIL_PARAMS'].split(',')
+    return (sender, recipient, password)
 
 def utc_epoch_to_ak_time_str(epoch: int, format_milliseconds: bool = False) -> str:
     '''
@@ -1,7 +1,10 @@
 import ast
+import functools
 import geopandas as gpd
+import os
 import pandas as pd
 import pathlib
+import pickle as pkl
 from typing import Sequence
 import sys
 
@@ -10,6 +13,39 @@ sys.path.append(proj_root)
 
 from utils.general import send_email, utc_epoch_to_ak_time_str
 
+def load_plan(plan_path: str | pathlib.Path) -> pd.DataFrame:
+    '''
+    Loads a tab-delimited plan file from ..planning into a DataFrame.
+    A pickled copy of the DataFrame is saved next to the plan file and reused while it is newer than the plan file,
+    so the .tsv only gets parsed again after it has been modified.
+
+    Args:
+        * plan_path (str | pathlib.Path) -- Path to a .tsv plan file.
+
+    Returns:
+        * pd.DataFrame -- Contents of the plan file.
+    '''
+    plan_path = pathlib.Path(plan_path)
+    cache_path = plan_path.with_suffix('.pkl')
+
+    # an unreadable cache (i.e. truncated, or pickled by a different pandas version) is rebuilt from the plan file
+    if cache_path.exists() and cache_path.stat().st_mtime >= plan_path.stat().st_mtime:
+        try:
+            with open(cache_path, 'rb') as file:
+                return pkl.load(file)
+        except Exception:
+            pass
+
+    plan = pd.read_csv(plan_path, delimiter='\t')
+
+    # the cache is written to a temporary file and then moved into place, so an interrupted write never leaves a partial cache
+    tmp_path = cache_path.with_suffix('.tmp')
+    with open(tmp_path, 'wb') as file:
+        pkl.dump(plan, file)
+    os.replace(tmp_path, cache_path)
+
+    return plan
+
 def write_analysis_types_dict(analysis_plan: pd.DataFrame, var_alias: str) -> dict:
     '''
     Create a dictionary of {'ANALYSIS TYPE' : (input_field_a, input_field_b, ...)} pairs
@@ -19,10 +55,18 @@ def write_analysis_types_dict(analysis_plan: pd.DataFrame, var_alias: str) -> di
         analysis_plan['ALIAS'] == var_alias
         ].drop(columns='ALIAS').iloc[0].to_dict()
     
-    analysis_types = {key: ast.literal_eval(value) for key, value in analysis_types.items() if not pd.isna(value) and value != ''}
+    analysis_types = {key: _parse_plan_tuple(value) for key, value in analysis_types.items() if not pd.isna(value) and value != ''}
 
     return analysis_types
 
+@functools.lru_cache(maxsize=None)
+def _parse_plan_tuple(value: str) -> tuple:
+    '''
+    Parses a tuple literal from a plan cell, i.e. "('FireManagementOption',)".
+    Plans hold a small, fixed set of these strings, so each one is only parsed once per process.
+    '''
+    return ast.literal_eval(value)
+
 def batch_write_attr_tups(identifier, buf_dist, var_alias, analysis_types, value=None):
     '''
     Writes all attribution tuples for a given fire feature and value-at-risk input, giving
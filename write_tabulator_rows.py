@@ -2,7 +2,6 @@ import asyncio
 from datetime import datetime, timezone
 import json
 import numpy as np
-import os
 import pathlib
 import pandas as pd
 import pytz
@@ -10,7 +9,7 @@ import sys
 import traceback
 import time
 
-from utils.general import basic_file_logger, format_logged_exception, send_email
+from utils.general import basic_file_logger, format_logged_exception, send_email, get_send_email_params
 from utils.arcgis_helpers import AsyncArcGISRequester, arcgis_features_to_dataframe, arcgis_features_to_gdf, checkout_token
 
 async def get_recent_fires_info(dof_perims_locs_url: str, wfigs_locs_url: str, query_epoch_milliseconds: int, irwins_with_errors: set, token: str, testing: bool = False) -> tuple[dict | None, Exception | None]:
@@ -215,12 +214,12 @@ def main():
     # there is targeted exception handling at lower levels
     try:
 
-        sender, recipient, password = os.getenv('SEND_EMAIL_PARAMS').split(',')
+        sender, recipient, password = get_send_email_params()
 
         logger = basic_file_logger('write_tabulator_rows_info.log')
         logger.info('STARTING PROCESS')
 
-        proj_dir = pathlib.Path().cwd()
+        proj_dir = pathlib.Path.cwd()
         plans_dir = proj_dir / 'planning'
         input_json_dir = proj_dir / 'docs' / 'input_json'
 